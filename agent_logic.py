@@ -1,11 +1,18 @@
 import os
+import contextvars
 import json
+import threading
+import time
 from dotenv import load_dotenv
 from typing import TypedDict, Optional, Literal
-from langchain_openai import ChatOpenAI 
-from langchain_core.messages import SystemMessage, HumanMessage
-from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
+
+import budget
+from metrics import registry
+from slide_library import get_library
+from tracing import tracer, traced_node, instrument_checkpointer, current_span
+
+# NOTE: langchain / langgraph / openai are imported lazily (inside the
+# functions below) -- together they cost ~2s of cold-start on every import.
 
 load_dotenv()
 
@@ -16,10 +23,136 @@ class AgentState(TypedDict):
     narrative_plan: Optional[dict]
     human_feedback: Optional[str]
     design_style: Optional[dict] 
+    user_id: Optional[str]
+    ledger: Optional[dict]  # per-call tokens / latency, see budget.py
+
+# Assign directly to swap in another model (it then serves every model tier).
+llm = None
+_models = {}
+_llm_lock = threading.Lock()
+
+def get_llm(model_name=None):
+    """Returns the chat model for `model_name` (default budget.DEFAULT_MODEL), creating it on first call."""
+    global llm
+    if llm is not None:
+        return llm
+    model_name = model_name or budget.DEFAULT_MODEL
+    if model_name in _models:
+        return _models[model_name]
+    with _llm_lock:
+        # Re-check: another thread may have created it while we waited.
+        if llm is not None:
+            return llm
+        # Set MOCK_LLM (e.g. "instant", "gpt-4o" or "0.3:120") to run fully offline.
+        if os.getenv("MOCK_LLM"):
+            from mock_llm import FakeChatModel
+            llm = FakeChatModel(profile=os.getenv("MOCK_LLM"))
+            return llm
+        if model_name not in _models:
+            from langchain_openai import ChatOpenAI
+            from openai import DefaultHttpxClient
+            _models[model_name] = ChatOpenAI(
+                model=model_name, temperature=0, stream_usage=True,
+                http_client=DefaultHttpxClient(event_hooks={"request": [_count_http_attempt]}),
+            )
+        return _models[model_name]
+
+def build_messages(system, prompt):
+    from langchain_core.messages import SystemMessage, HumanMessage
+    return [SystemMessage(content=system), HumanMessage(content=prompt)]
+
+LLM_REQUESTS = registry.counter("llm_requests_total", "LLM calls by node and model.", ["node", "model"])
+LLM_ERRORS = registry.counter("llm_errors_total", "Failed LLM calls (after client retries) by node and error type.", ["node", "error"])
+LLM_RETRIED = registry.counter("llm_retries_total", "HTTP retries made by the OpenAI client (its max_retries).", ["node"])
+LLM_TOKENS = registry.counter("llm_tokens_total", "LLM tokens by node and direction.", ["node", "direction"])
+LLM_TTFT = registry.histogram("llm_time_to_first_token_seconds", "Time to first streamed token.", ["node"])
+
+# HTTP requests made by the current call_llm(); counted by the client's request hook.
+_llm_attempts = contextvars.ContextVar("llm_attempts", default=None)
+
+def _count_http_attempt(request):
+    attempts = _llm_attempts.get()
+    if attempts is not None:
+        attempts[0] += 1
+
+# Callbacks fired after every LLM call: fn(thread_id, name, messages, response, stats)
+llm_listeners = []
+
+def add_llm_listener(fn):
+    if fn not in llm_listeners:
+        llm_listeners.append(fn)
+
+def call_llm(messages, name, model_name=None):
+    """
+    Streams a completion so we can record time-to-first-token, then returns
+    the merged message (same shape as `llm.invoke`).
+    """
+    model = get_llm(model_name)
+    model_label = getattr(model, "model_name", type(model).__name__)
+    LLM_REQUESTS.inc(node=name, model=model_label)
+    with tracer.span(f"llm.{name}", model=model_label) as span:
+        start = time.perf_counter()
+        ttft = None
+        response = None
+        attempts = _llm_attempts.set([0])
+        try:
+            for chunk in model.stream(messages):
+                if ttft is None and chunk.content:
+                    ttft = time.perf_counter() - start
+                response = chunk if response is None else response + chunk
+        except Exception as exc:
+            LLM_ERRORS.inc(node=name, error=type(exc).__name__)
+            raise
+        finally:
+            # Retries happen inside the client; every HTTP request past the first is one.
+            retries = max(0, _llm_attempts.get()[0] - 1)
+            _llm_attempts.reset(attempts)
+            if retries:
+                LLM_RETRIED.inc(retries, node=name)
+                span.set(retries=retries)
+        usage = response.usage_metadata or {}
+        LLM_TOKENS.inc(usage.get("input_tokens", 0), node=name, direction="input")
+        LLM_TOKENS.inc(usage.get("output_tokens", 0), node=name, direction="output")
+        if ttft is not None:
+            LLM_TTFT.observe(ttft, node=name)
+        span.set(
+            prompt_tokens=usage.get("input_tokens"),
+            completion_tokens=usage.get("output_tokens"),
+            ttft_ms=round(ttft * 1000, 1) if ttft is not None else None,
+        )
+        stats = {"latency_s": time.perf_counter() - start, "ttft_s": ttft, "usage": dict(usage)}
+        for listener in llm_listeners:
+            listener(span.thread_id, name, messages, response, stats)
+    return response
+
+def budgeted_call(state: AgentState, system, prompt, name):
+    """
+    call_llm() under the thread's budget: switches to the fallback model once
+    a cap is close, and returns (response, updated ledger).
+    """
+    ledger = state.get("ledger") or budget.new_ledger()
+    decision, reason = budget.check(ledger, state.get("user_id"))
+    model_name = budget.DEFAULT_MODEL
+    if decision != budget.OK:
+        model_name = budget.FALLBACK_MODEL
+        ledger = budget.add_notice(ledger, f"Switched to {model_name}: {reason}.")
+
+    start = time.perf_counter()
+    response = call_llm(build_messages(system, prompt), name, model_name)
+    latency = time.perf_counter() - start
+    usage = dict(response.usage_metadata or {})
+
+    span = current_span()
+    budget.get_usage_store().add(state.get("user_id"), span.thread_id if span else None, name, model_name, usage, latency)
+    return response, budget.record(ledger, name, model_name, usage, latency)
 
-llm = ChatOpenAI(model="gpt-4o", temperature=0)
+def budget_exhausted(state: AgentState):
+    """Returns the reason if this thread may not start another LLM loop, else None."""
+    decision, reason = budget.check(state.get("ledger"), state.get("user_id"))
+    return reason if decision == budget.EXHAUSTED else None
 
 # --- 1. ANALYST NODE ---
+@traced_node("analyst")
 def analyst_node(state: AgentState):
     feedback = state.get('human_feedback', '')
     combined_input = f"USER GOAL: {state.get('user_request')}\nDATA: {state.get('raw_files_content')}"
@@ -32,14 +165,53 @@ def analyst_node(state: AgentState):
     Context: {combined_input}
     Feedback: {feedback}
     """
-    response = llm.invoke([
-        SystemMessage(content="You are a strategic advisor."),
-        HumanMessage(content=prompt)
-    ])
-    return {"analysis_report": response.content}
+    response, ledger = budgeted_call(state, "You are a strategic advisor.", prompt, "analyst")
+    return {"analysis_report": response.content, "ledger": ledger}
 
 # --- 2. STORY ARCHITECT NODE ---
+def find_reference_slides(state: AgentState, k=3):
+    """Approved slides from past decks that match this report, as a prompt section."""
+    library = get_library()
+    if library is None:
+        return ""
+    query = f"{state.get('user_request', '')}\n{(state.get('analysis_report') or '')[:2000]}"
+    with tracer.span("library.search") as span:
+        hits = library.search(query, k=k)
+        span.set(hits=len(hits))
+    if not hits:
+        return ""
+    # Retrieval is not use: save_approved_plan() bumps the slides a deck keeps.
+    return f"""
+    APPROVED SLIDES FROM PAST DECKS (reuse or adapt them where they fit this story, keeping proven wording):
+    {json.dumps([slide for _, _, slide in hits], indent=1)}
+    """
+
+def is_approval(feedback):
+    """Empty feedback or the generic approval both mean "move on"."""
+    return not feedback or feedback == "Proceed with this strategy."
+
+def save_approved_plan(state_values):
+    """
+    Adds a finished run's slides to the library so future decks can reuse them.
+    Runs the budget finalized over change requests are not approved, so they are skipped.
+    """
+    if not is_approval(state_values.get("human_feedback")):
+        return
+    library = get_library()
+    if library is not None and state_values.get("narrative_plan"):
+        with tracer.span("library.add"):
+            library.add_plan(
+                state_values["narrative_plan"],
+                state_values.get("user_request", ""),
+                state_values.get("analysis_report", ""),
+            )
+
+@traced_node("story_architect")
 def story_node(state: AgentState):
+    if state.get("narrative_plan") and (reason := budget_exhausted(state)):
+        # Out of budget: keep the last plan instead of another revision.
+        return {"ledger": budget.add_notice(state.get("ledger"), f"Finalized the current plan: {reason}.")}
+
     feedback = state.get('human_feedback', "No feedback provided.")
     print(f"--- ARCHITECT FEEDBACK RECEIVED: {feedback} ---") # Debug print
     
@@ -47,7 +219,7 @@ def story_node(state: AgentState):
     Based on this report: {state.get('analysis_report')}
     
     Current Feedback/Revision Request: "{feedback}"
-    
+    {find_reference_slides(state)}
     TASK 1: Create a 3-slide plan.
     TASK 2: Act as a CREATIVE DIRECTOR. Choose a font style.
     TASK 3: A
@@ -66,28 +238,37 @@ def story_node(state: AgentState):
       ]
     }}
     """
-    response = llm.invoke([
-        SystemMessage(content="You are a Presentation Expert, specialising in producing PowerPoint presentations that follow clear narratives and story-lines, targeting executive audiences. Output ONLY JSON."),
-        HumanMessage(content=prompt)
-    ])
+    response, ledger = budgeted_call(
+        state,
+        "You are a Presentation Expert, specialising in producing PowerPoint presentations that follow clear narratives and story-lines, targeting executive audiences. Output ONLY JSON.",
+        prompt,
+        "story_architect",
+    )
     
     content = response.content
     if "```" in content:
         content = content.split("```")[1].replace("json", "").strip()
     
-    try:
-        return {"narrative_plan": json.loads(content)}
-    except:
-        return {"narrative_plan": {"slides": [{"title": "Error", "bullets": ["JSON Error"], "speaker_notes": ""}]}}
+    with tracer.span("parse.json", chars=len(content)) as span:
+        try:
+            return {"narrative_plan": json.loads(content), "ledger": ledger}
+        except:
+            span.set(error="JSONDecodeError")
+            return {"narrative_plan": {"slides": [{"title": "Error", "bullets": ["JSON Error"], "speaker_notes": ""}]}, "ledger": ledger}
 
 # --- ROUTING LOGIC ---
+@traced_node("human_review")
 def human_review_node(state: AgentState): return {}
+@traced_node("critique")
 def critique_node(state: AgentState): return {}
 
 def route_after_review(state: AgentState):
     feedback = state.get('human_feedback', '')
     # If feedback is empty or generic approval, move forward
-    if not feedback or feedback == "Proceed with this strategy.":
+    if is_approval(feedback):
+        return "story_architect"
+    # Out of budget: stop re-analysing and build the deck from the current report.
+    if budget_exhausted(state):
         return "story_architect"
     # Otherwise, go back to fix strategy
     return "analyst"
@@ -95,26 +276,71 @@ def route_after_review(state: AgentState):
 def route_after_critique(state: AgentState):
     feedback = state.get('human_feedback', '')
     # If feedback is empty or generic approval, FINISH
-    if not feedback or feedback == "Proceed with this strategy.":
+    if is_approval(feedback) or budget_exhausted(state):
+        from langgraph.graph import END
         return END
     # Otherwise, go back to fix slides
     return "story_architect"
 
 # --- GRAPH SETUP ---
-workflow = StateGraph(AgentState)
-workflow.add_node("analyst", analyst_node)
-workflow.add_node("human_review", human_review_node)
-workflow.add_node("story_architect", story_node)
-workflow.add_node("critique", critique_node)
+def build_graph():
+    from langgraph.graph import StateGraph, END
+
+    workflow = StateGraph(AgentState)
+    workflow.add_node("analyst", analyst_node)
+    workflow.add_node("human_review", human_review_node)
+    workflow.add_node("story_architect", story_node)
+    workflow.add_node("critique", critique_node)
+
+    workflow.set_entry_point("analyst")
+
+    workflow.add_edge("analyst", "human_review")
+    workflow.add_conditional_edges("human_review", route_after_review, {"analyst": "analyst", "story_architect": "story_architect"})
+
+    workflow.add_edge("story_architect", "critique")
+    # FIX: This was missing! Now it checks feedback before ending.
+    workflow.add_conditional_edges("critique", route_after_critique, {"story_architect": "story_architect", END: END})
+    return workflow
+
+_app = None
+_app_lock = threading.Lock()
+
+def build_checkpointer():
+    """
+    In-process MemorySaver by default. Set CHECKPOINT_DB to share checkpoints
+    through SQLite, which out-of-process workers (worker.py) require.
+    """
+    path = os.getenv("CHECKPOINT_DB")
+    if not path:
+        from langgraph.checkpoint.memory import MemorySaver
+        return MemorySaver()
 
-workflow.set_entry_point("analyst")
+    import sqlite3
+    from langgraph.checkpoint.sqlite import SqliteSaver
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return SqliteSaver(conn)
 
-workflow.add_edge("analyst", "human_review")
-workflow.add_conditional_edges("human_review", route_after_review, {"analyst": "analyst", "story_architect": "story_architect"})
+def count_threads(saver):
+    """Conversation threads held by the checkpointer (MemorySaver or SqliteSaver)."""
+    if hasattr(saver, "storage"):
+        return len(saver.storage)
+    with saver.lock:
+        return saver.conn.execute("SELECT COUNT(DISTINCT thread_id) FROM checkpoints").fetchone()[0]
 
-workflow.add_edge("story_architect", "critique")
-# FIX: This was missing! Now it checks feedback before ending.
-workflow.add_conditional_edges("critique", route_after_critique, {"story_architect": "story_architect", END: END})
+def get_app():
+    """Compiles the graph once per process and returns the cached app."""
+    global _app
+    if _app is None:
+        with _app_lock:
+            if _app is None:
+                memory = instrument_checkpointer(build_checkpointer())
+                registry.gauge("checkpointer_threads", "Threads stored in the graph checkpointer.", fn=lambda: count_threads(memory))
+                _app = build_graph().compile(checkpointer=memory, interrupt_before=["human_review", "critique"])
+    return _app
 
-memory = MemorySaver()
-app = workflow.compile(checkpointer=memory, interrupt_before=["human_review", "critique"])
\ No newline at end of file
+def __getattr__(name):
+    # Keeps `from agent_logic import app` working without compiling at import.
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,134 @@
+"""
+Disk-spooled storage for generated decks and uploaded templates.
+
+Artifacts live under `$ARTIFACT_DIR/<thread_id>/<sha256-prefix><suffix>`, so
+identical content is stored once per thread and session_state only holds a
+path. Files expire after `ARTIFACT_TTL_SECONDS` and the oldest are evicted
+once the directory exceeds `ARTIFACT_QUOTA_MB`.
+"""
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+ARTIFACT_DIR = os.getenv("ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "storytelling_copilot_artifacts"))
+ARTIFACT_TTL_SECONDS = int(os.getenv("ARTIFACT_TTL_SECONDS", 24 * 3600))
+ARTIFACT_QUOTA_MB = float(os.getenv("ARTIFACT_QUOTA_MB", 512))
+
+CHUNK_SIZE = 1024 * 1024
+CLEANUP_INTERVAL_SECONDS = 60
+
+
+class ArtifactStore:
+    def __init__(self, root=ARTIFACT_DIR, ttl_seconds=ARTIFACT_TTL_SECONDS, quota_bytes=int(ARTIFACT_QUOTA_MB * 1024 * 1024)):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self.quota_bytes = quota_bytes
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+
+    def _thread_dir(self, thread_id):
+        return os.path.join(self.root, re.sub(r"[^A-Za-z0-9_.-]", "_", thread_id))
+
+    def put(self, thread_id, data, suffix=""):
+        """
+        Spools `data` (bytes or a readable file-like object) to disk in 1 MB
+        chunks, hashing as it goes. Returns the artifact path.
+        """
+        thread_dir = self._thread_dir(thread_id)
+        os.makedirs(thread_dir, exist_ok=True)
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            chunks = [bytes(data)]
+        else:
+            if hasattr(data, "seek"):
+                data.seek(0)
+            chunks = iter(lambda: data.read(CHUNK_SIZE), b"")
+
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=thread_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    f.write(chunk)
+            path = os.path.join(thread_dir, digest.hexdigest()[:32] + suffix)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+                os.utime(path)  # Refresh TTL / LRU position
+            else:
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self.maybe_cleanup()
+        return path
+
+    def exists(self, path):
+        return bool(path) and os.path.exists(path)
+
+    def open(self, path):
+        return open(path, "rb")
+
+    def read_bytes(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def drop_thread(self, thread_id):
+        shutil.rmtree(self._thread_dir(thread_id), ignore_errors=True)
+
+    def maybe_cleanup(self):
+        """Runs `cleanup` at most once per CLEANUP_INTERVAL_SECONDS."""
+        if time.time() - self._last_cleanup >= CLEANUP_INTERVAL_SECONDS:
+            self.cleanup()
+
+    def cleanup(self):
+        """Deletes expired artifacts, then evicts least-recently-used ones until under quota."""
+        with self._lock:
+            self._last_cleanup = now = time.time()
+            files = []
+            for dirpath, _, filenames in os.walk(self.root):
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+
+            total = 0
+            kept = []
+            for mtime, size, path in files:
+                if now - mtime > self.ttl_seconds:
+                    _remove(path)
+                else:
+                    kept.append((mtime, size, path))
+                    total += size
+
+            for mtime, size, path in sorted(kept):
+                if total <= self.quota_bytes:
+                    break
+                _remove(path)
+                total -= size
+
+            # Drop thread folders left empty
+            if os.path.isdir(self.root):
+                for name in os.listdir(self.root):
+                    thread_dir = os.path.join(self.root, name)
+                    if os.path.isdir(thread_dir) and not os.listdir(thread_dir):
+                        os.rmdir(thread_dir)
+            return total
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+store = ArtifactStore()
@@ -0,0 +1,172 @@
+"""
+End-to-end latency benchmark over the `sample_data/` cases.
+
+Drives the compiled LangGraph `app` through both HITL interrupts for each case
+(approving strategy and slides), then renders the deck with `generate_pptx`.
+Runs offline against `FakeChatModel` unless --live is passed.
+
+    python benchmark.py                      # instant mock, all cases
+    python benchmark.py --profile gpt-4o     # realistic mock latency
+    python benchmark.py --runs 5 --json bench.json
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+SAMPLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_data")
+APPROVE = "Proceed with this strategy."
+STAGES = ["parse", "dedupe", "analyst", "story_architect", "finalize", "render"]
+
+
+def checkpoint_size(app, config):
+    """Serialized size (bytes) of the latest checkpoint for this thread."""
+    saved = app.checkpointer.get_tuple(config)
+    if saved is None:
+        return 0
+    _, payload = app.checkpointer.serde.dumps_typed(saved.checkpoint)
+    return len(payload)
+
+
+def run_case(case_dir, run_index, trace_memory=False):
+    """
+    One pass through a case. Timed passes run without tracemalloc, which slows
+    allocation-heavy stages several times over; peak memory comes from a
+    separate `trace_memory` pass whose timings are discarded.
+    """
+    # Deferred so the MOCK_LLM env var set in main() is honoured.
+    from agent_logic import app
+    from create_ppt import generate_pptx
+    from dedup import dedupe_sources
+    from ingest import build_raw_content, load_case_folder
+    from tracing import tracer
+
+    case_name = os.path.basename(case_dir.rstrip("/"))
+    config = {"configurable": {"thread_id": f"bench_{case_name}_{run_index}"}}
+    results = {}
+
+    def stage(name, fn):
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        with tracer.span(f"bench.{name}", thread_id=config["configurable"]["thread_id"]):
+            out = fn()
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            "seconds": elapsed,
+            "checkpoint_bytes": checkpoint_size(app, config) if name not in ("parse", "dedupe") else 0,
+        }
+        if trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results[name]["peak_mem_kb"] = peak / 1024
+        return out
+
+    def resume(feedback):
+        app.update_state(config, {"human_feedback": feedback})
+        for _ in app.stream(None, config=config):
+            pass
+
+    def start(inputs):
+        for _ in app.stream(inputs, config=config):
+            pass
+
+    user_request, files = stage("parse", lambda: load_case_folder(case_dir))
+    files, dedup_stats = stage("dedupe", lambda: dedupe_sources(files))
+    results["dedupe"]["tokens_saved"] = dedup_stats["tokens_saved"]
+    inputs = {"user_request": user_request, "raw_files_content": build_raw_content(files)}
+
+    stage("analyst", lambda: start(inputs))             # -> pauses before human_review
+    stage("story_architect", lambda: resume(APPROVE))   # -> pauses before critique
+    stage("finalize", lambda: resume(APPROVE))          # -> END
+
+    snapshot = app.get_state(config)
+    if snapshot.next:
+        raise RuntimeError(f"{case_name}: workflow did not finish, paused at {snapshot.next}")
+
+    stream = stage("render", lambda: generate_pptx(snapshot.values["narrative_plan"]))
+    results["render"]["pptx_bytes"] = len(stream.getvalue())
+    return results
+
+
+def summarize(runs):
+    """Median across runs for every numeric metric of every stage."""
+    summary = {}
+    for stage in STAGES:
+        keys = runs[0][stage].keys()
+        summary[stage] = {k: statistics.median(r[stage][k] for r in runs) for k in keys}
+    summary["total_seconds"] = sum(summary[s]["seconds"] for s in STAGES)
+    return summary
+
+
+def print_report(report):
+    header = f"{'case':<32}{'stage':<17}{'wall ms':>10}{'peak KB':>11}{'ckpt B':>10}"
+    print(header)
+    print("-" * len(header))
+    for case_name, summary in report["cases"].items():
+        for stage in STAGES:
+            m = summary[stage]
+            print(f"{case_name:<32}{stage:<17}{m['seconds'] * 1000:>10.1f}"
+                  f"{m['peak_mem_kb']:>11.0f}{m['checkpoint_bytes']:>10.0f}")
+        print(f"{'':<32}{'TOTAL':<17}{summary['total_seconds'] * 1000:>10.1f}"
+              f"   pptx={summary['render']['pptx_bytes'] / 1024:.0f} KB")
+    print(f"\nmax RSS: {report['max_rss_mb']:.1f} MB | profile: {report['profile']} | runs: {report['runs']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", default="instant", help="Mock latency profile name or 'ttft:tokens_per_sec'.")
+    parser.add_argument("--live", action="store_true", help="Use the real gpt-4o client instead of the mock.")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per case (median is reported).")
+    parser.add_argument("--cases", nargs="*", help="Case folder names under sample_data/ (default: all).")
+    parser.add_argument("--json", dest="json_path", help="Also write the raw report to this file.")
+    args = parser.parse_args(argv)
+
+    if args.live:
+        os.environ.pop("MOCK_LLM", None)
+    else:
+        os.environ["MOCK_LLM"] = args.profile
+    # Keep prompts independent of whatever the local slide library holds (opt in with SLIDE_LIBRARY=1).
+    os.environ.setdefault("SLIDE_LIBRARY", "0")
+    # Benchmark calls should not count against anyone's daily budget.
+    os.environ.setdefault("USAGE_DB", os.path.join(tempfile.gettempdir(), "benchmark_usage.db"))
+
+    case_names = args.cases or sorted(
+        d for d in os.listdir(SAMPLE_DIR) if os.path.isdir(os.path.join(SAMPLE_DIR, d))
+    )
+
+    # Warm the process so cold-start imports (see profile_imports.py) aren't billed to the first case.
+    import agent_logic
+    import create_ppt
+    import pandas
+    agent_logic.get_app()
+    agent_logic.get_llm()
+
+    report = {"profile": "live" if args.live else args.profile, "runs": args.runs, "cases": {}}
+    for case_name in case_names:
+        case_dir = os.path.join(SAMPLE_DIR, case_name)
+        runs = [run_case(case_dir, i) for i in range(args.runs)]
+        summary = summarize(runs)
+        memory = run_case(case_dir, "mem", trace_memory=True)
+        for stage in STAGES:
+            summary[stage]["peak_mem_kb"] = memory[stage]["peak_mem_kb"]
+        report["cases"][case_name] = summary
+
+    # ru_maxrss is KB on Linux, bytes on macOS.
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report["max_rss_mb"] = max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Micro-benchmark for the PPTX renderer (create_ppt.py), no LLM involved.
+
+Synthetic narrative plans from 3 to 500 slides, in one- and two-column
+layouts with short and long text, are laid out (`build_presentation`) and
+serialized (`save_presentation`) separately. The report gives per-slide build
+time, save time, .pptx size and tracemalloc peak per scenario. Results are
+compared to a stored baseline, and the script exits 1 if any metric regresses
+by more than --tolerance (flagged scenarios are re-measured once first).
+
+    python benchmark_render.py                      # compare to render_baseline.json
+    python benchmark_render.py --update-baseline    # accept the current numbers
+    python benchmark_render.py --sizes 3 50 --tolerance 0.5
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "render_baseline.json")
+SIZES = [3, 25, 100, 500]
+WARMUP_SECONDS = 1.0
+LAYOUTS = ["one_col", "two_col"]
+TEXTS = ["short", "long"]
+
+# Timings below these floors are too noisy to call a regression on.
+NOISE_FLOOR = {"build_ms_per_slide": 0.5, "save_ms": 5.0, "size_kb": 2.0, "peak_kb": 256.0}
+
+WORDS = (
+    "revenue margin churn pipeline forecast region launch pricing cost supply partner retention "
+    "board growth target share segment capacity logistics inventory hiring risk mitigation roadmap"
+).split()
+
+
+def sentence(rng, chars):
+    words = []
+    while sum(len(w) + 1 for w in words) < chars:
+        words.append(rng.choice(WORDS))
+    return " ".join(words).capitalize()[:chars]
+
+
+def synthetic_plan(num_slides, layout, text, seed=0):
+    """
+    A plan whose content slides all take `layout` in create_smart_content_slide
+    (two columns kick in at > 5 bullets or > 400 chars).
+    """
+    rng = random.Random(seed)
+    if layout == "one_col":
+        bullets, bullet_chars = (3, 40) if text == "short" else (3, 130)
+    else:
+        bullets, bullet_chars = (8, 40) if text == "short" else (8, 180)
+    title_chars, notes_chars = (30, 120) if text == "short" else (90, 900)
+
+    slides = [{"title": sentence(rng, title_chars), "bullets": [], "speaker_notes": sentence(rng, notes_chars)}]
+    for _ in range(num_slides - 1):
+        slides.append({
+            "title": sentence(rng, title_chars),
+            "bullets": [sentence(rng, bullet_chars) for _ in range(bullets)],
+            "speaker_notes": sentence(rng, notes_chars),
+        })
+    return {"slides": slides}
+
+
+def measure(plan, repeat, min_slides=150):
+    from create_ppt import build_presentation, save_presentation
+
+    num_slides = len(plan["slides"])
+    build_times, save_times = [], []
+    # Small decks render in a few ms, so repeat them until ~min_slides slides were built.
+    for _ in range(max(repeat, math.ceil(min_slides / num_slides))):
+        start = time.perf_counter()
+        prs = build_presentation(plan)
+        built = time.perf_counter()
+        stream = save_presentation(prs)
+        build_times.append(built - start)
+        save_times.append(time.perf_counter() - built)
+    size = len(stream.getbuffer())
+
+    # Separate pass: tracemalloc slows allocation-heavy code, so it must not skew the timings.
+    tracemalloc.start()
+    save_presentation(build_presentation(plan))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        # Fastest run: the least disturbed by GC and other processes.
+        "build_ms_per_slide": round(min(build_times) * 1000 / num_slides, 3),
+        "save_ms": round(min(save_times) * 1000, 2),
+        "size_kb": round(size / 1024, 1),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def find_regressions(baseline, results, tolerance):
+    failures = []
+    for scenario, metrics in results.items():
+        base = baseline.get(scenario)
+        if not base:
+            continue
+        for key, value in metrics.items():
+            allowed = max(base[key] * (1 + tolerance), base[key] + NOISE_FLOOR[key])
+            if value > allowed:
+                failures.append(f"{scenario} {key}: {value} vs baseline {base[key]} (+{value / base[key] - 1:.0%})")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="*", default=SIZES, help="Slide counts to render.")
+    parser.add_argument("--repeat", type=int, default=3, help="Minimum timed renders per scenario (the fastest is reported).")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression (0.25 = +25%%).")
+    args = parser.parse_args(argv)
+
+    # Warm-up: python-pptx import, first-template parse and a cold CPU are not part of
+    # rendering. One deck is not enough; the first scenarios then time ~40% slow.
+    from create_ppt import generate_pptx
+    warm_until = time.perf_counter() + WARMUP_SECONDS
+    while time.perf_counter() < warm_until:
+        generate_pptx(synthetic_plan(25, LAYOUTS[0], TEXTS[0]))
+
+    results, scenarios = {}, {}
+    print(f"{'scenario':<24}{'build ms/slide':>16}{'save ms':>10}{'size KB':>10}{'peak KB':>10}")
+    for size in args.sizes:
+        for layout in LAYOUTS:
+            for text in TEXTS:
+                scenario = f"{size}_{layout}_{text}"
+                scenarios[scenario] = (size, layout, text)
+                metrics = measure(synthetic_plan(size, layout, text), args.repeat)
+                results[scenario] = metrics
+                print(f"{scenario:<24}{metrics['build_ms_per_slide']:>16.3f}{metrics['save_ms']:>10.1f}"
+                      f"{metrics['size_kb']:>10.1f}{metrics['peak_kb']:>10.1f}")
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\n💾 Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline first.")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    failures = find_regressions(baseline, results, args.tolerance)
+    if failures:
+        # Confirm before failing: re-measure flagged scenarios once and keep the better numbers.
+        for scenario, params in scenarios.items():
+            if not find_regressions(baseline, {scenario: results[scenario]}, args.tolerance):
+                continue
+            again = measure(synthetic_plan(*params), args.repeat)
+            results[scenario] = {key: min(value, again[key]) for key, value in results[scenario].items()}
+        failures = find_regressions(baseline, results, args.tolerance)
+    if failures:
+        for failure in failures:
+            print(f"❌ REGRESSION: {failure}")
+        sys.exit(1)
+    print(f"\n✅ Rendering within {args.tolerance:.0%} of baseline.")
+
+
+if __name__ == "__main__":
+    main()
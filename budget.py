@@ -0,0 +1,166 @@
+"""
+Token / loop / LLM-time budgets per thread, plus a per-user daily usage store.
+
+The ledger lives in `AgentState["ledger"]`, so it is checkpointed with the
+run. Every Analyst / Architect LLM call appends an entry (tokens, latency,
+model). `check()` turns the ledger into a decision:
+
+    ok        -> normal model
+    degrade   -> a cap is >= BUDGET_DEGRADE_AT full: switch to the cheaper model
+    exhausted -> a cap is hit: routing stops looping and the run finalizes
+
+    python budget.py report --days 7     # tokens / calls per user per day
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+
+MAX_ITERATIONS = int(os.getenv("BUDGET_MAX_ITERATIONS", 8))
+MAX_TOKENS = int(os.getenv("BUDGET_MAX_TOKENS", 150_000))
+# LLM time only: hours spent waiting for a reviewer at an interrupt must not finalize the run.
+MAX_LLM_SECONDS = float(os.getenv("BUDGET_MAX_LLM_SECONDS", 900))
+USER_DAILY_TOKENS = int(os.getenv("BUDGET_USER_DAILY_TOKENS", 2_000_000))
+DEGRADE_AT = float(os.getenv("BUDGET_DEGRADE_AT", 0.75))
+DEFAULT_MODEL = os.getenv("LLM_MODEL", "gpt-4o")
+FALLBACK_MODEL = os.getenv("BUDGET_FALLBACK_MODEL", "gpt-4o-mini")
+USAGE_DB = os.getenv("USAGE_DB", "usage.db")
+
+OK, DEGRADE, EXHAUSTED = "ok", "degrade", "exhausted"
+
+
+def new_ledger():
+    return {"started_at": time.time(), "iterations": 0, "tokens": 0, "llm_seconds": 0.0, "entries": [], "notices": []}
+
+
+def record(ledger, node, model, usage, latency_s):
+    """Returns a new ledger with one LLM call appended (state updates must not mutate)."""
+    ledger = dict(ledger or new_ledger())
+    tokens = (usage or {}).get("total_tokens", 0)
+    ledger["entries"] = ledger["entries"] + [{
+        "node": node,
+        "model": model,
+        "input_tokens": (usage or {}).get("input_tokens", 0),
+        "output_tokens": (usage or {}).get("output_tokens", 0),
+        "latency_s": round(latency_s, 3),
+        "ts": time.time(),
+    }]
+    ledger["iterations"] += 1
+    ledger["tokens"] += tokens
+    ledger["llm_seconds"] = round(ledger["llm_seconds"] + latency_s, 3)
+    return ledger
+
+
+def add_notice(ledger, notice):
+    ledger = dict(ledger or new_ledger())
+    if notice not in ledger["notices"]:
+        ledger["notices"] = ledger["notices"] + [notice]
+    return ledger
+
+
+def check(ledger, user_id=None):
+    """
+    Returns (decision, reason) for the next LLM call of this thread. The daily
+    per-user cap only applies with a real `user_id`; unauthenticated sessions
+    are bounded by the per-thread caps alone.
+    """
+    ledger = ledger or new_ledger()
+    usage = [
+        ("iterations", ledger["iterations"], MAX_ITERATIONS),
+        ("tokens", ledger["tokens"], MAX_TOKENS),
+        ("LLM time", ledger["llm_seconds"], MAX_LLM_SECONDS),
+    ]
+    if user_id:
+        usage.append(("daily user tokens", get_usage_store().tokens_today(user_id), USER_DAILY_TOKENS))
+
+    for name, used, cap in usage:
+        if used >= cap:
+            return EXHAUSTED, f"{name} cap reached ({used:,.0f}/{cap:,.0f})"
+    for name, used, cap in usage:
+        if used >= cap * DEGRADE_AT:
+            return DEGRADE, f"{name} at {used / cap:.0%} of cap"
+    return OK, ""
+
+
+class UsageStore:
+    """Append-only per-call usage log for cross-session reporting and daily user caps."""
+
+    def __init__(self, path=USAGE_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS usage ("
+                "user_id TEXT, day TEXT, thread_id TEXT, node TEXT, model TEXT, "
+                "input_tokens INTEGER, output_tokens INTEGER, latency_s REAL, ts REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS usage_user_day ON usage (user_id, day)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def add(self, user_id, thread_id, node, model, usage, latency_s):
+        usage = usage or {}
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO usage VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (user_id or "anonymous", date.today().isoformat(), thread_id, node, model,
+                 usage.get("input_tokens", 0), usage.get("output_tokens", 0), latency_s, time.time()),
+            )
+
+    def tokens_today(self, user_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COALESCE(SUM(input_tokens + output_tokens), 0) FROM usage WHERE user_id = ? AND day = ?",
+                (user_id, date.today().isoformat()),
+            ).fetchone()
+        return row[0]
+
+    def report(self, days=7):
+        cutoff = datetime.fromtimestamp(time.time() - days * 86400).date().isoformat()
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT day, user_id, COUNT(DISTINCT thread_id), COUNT(*), "
+                "SUM(input_tokens), SUM(output_tokens), SUM(latency_s) "
+                "FROM usage WHERE day >= ? GROUP BY day, user_id ORDER BY day DESC, SUM(input_tokens + output_tokens) DESC",
+                (cutoff,),
+            ).fetchall()
+
+
+_usage_store = None
+_usage_store_lock = threading.Lock()
+
+
+def get_usage_store():
+    global _usage_store
+    if _usage_store is None:
+        with _usage_store_lock:
+            if _usage_store is None:
+                _usage_store = UsageStore(USAGE_DB)
+    return _usage_store
+
+
+def use_usage_db(path):
+    """Points this process at another usage database (e.g. a throwaway one for replays)."""
+    global USAGE_DB, _usage_store
+    with _usage_store_lock:
+        USAGE_DB, _usage_store = path, None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    report = sub.add_parser("report")
+    report.add_argument("--days", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    if args.command == "report":
+        print(f"{'day':<12}{'user':<24}{'threads':>8}{'calls':>7}{'in tok':>10}{'out tok':>10}{'llm s':>9}")
+        for day, user, threads, calls, tin, tout, secs in get_usage_store().report(args.days):
+            print(f"{day:<12}{user:<24}{threads:>8}{calls:>7}{tin:>10,}{tout:>10,}{secs:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Prebuilt workspace bundles for recurring data packs.
+
+`python bundle.py build sample_data/case1_gcc_expansion` parses a folder laid
+out like the `sample_data/` cases once, and writes `$BUNDLE_DIR/<name>.bundle`.
+The bundle is a single file: a small JSON header (manifest, table summaries,
+fact index) followed by an uncompressed UTF-8 body (the ready-made
+`raw_files_content` and every file's deduplicated text). Opening a bundle
+mmaps it and reads only the header. Text is decoded straight from the mapping
+when asked for, so starting a deck on a known pack needs no parsing at all.
+
+`prompt_supplement()` gives the Analyst what per-file truncation cuts off:
+the table summaries, and the numeric fact lines that best match the user goal.
+
+    python bundle.py build FOLDER [--name NAME]
+    python bundle.py list
+    python bundle.py show NAME
+"""
+import argparse
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from io import BytesIO
+
+from dedup import dedupe_sources, split_paragraphs
+from ingest import build_raw_content, load_case_folder
+from slide_library import tokenize
+from tracing import tracer
+
+BUNDLE_DIR = os.getenv("BUNDLE_DIR", "bundles")
+MAGIC = b"SCBUNDL1"
+PREAMBLE = struct.Struct("<8sQ")  # magic, header length
+FACTS_IN_PROMPT = 15
+
+
+def bundle_path(name):
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+    return os.path.join(BUNDLE_DIR, f"{safe}.bundle")
+
+
+def fingerprint_folder(folder):
+    """(name, size, mtime) of every file, to tell when a bundle is out of date."""
+    return [
+        [name, os.path.getsize(os.path.join(folder, name)), int(os.path.getmtime(os.path.join(folder, name)))]
+        for name in sorted(os.listdir(folder))
+        if not name.startswith(".") and os.path.isfile(os.path.join(folder, name))
+    ]
+
+
+def summarize_table(name, data):
+    """Row count, columns and min / max / mean of numeric columns for a CSV or spreadsheet."""
+    import pandas as pd
+    df = pd.read_csv(BytesIO(data)) if name.lower().endswith(".csv") else pd.read_excel(BytesIO(data))
+    numeric = {
+        column: {"min": float(df[column].min()), "max": float(df[column].max()), "mean": round(float(df[column].mean()), 3)}
+        for column in df.select_dtypes("number").columns
+    }
+    return {"file": name, "rows": len(df), "columns": list(map(str, df.columns)), "numeric": numeric}
+
+
+def build_bundle(folder, name=None):
+    """Parses, dedupes and indexes a data-pack folder into one bundle file. Returns its path."""
+    name = name or os.path.basename(os.path.normpath(folder))
+    with tracer.span("bundle.build", folder=folder) as span:
+        user_request, files = load_case_folder(folder)
+        # Offline, so the whole of each file is deduped and indexed, not just what fits the prompt.
+        files, dedup_stats = dedupe_sources(files, max_chars=None)
+        raw_files_content = build_raw_content(files)
+
+        tables = []
+        for file_name, _ in files:
+            if file_name.lower().endswith((".csv", ".xlsx", ".xls")):
+                with open(os.path.join(folder, file_name), "rb") as f:
+                    tables.append(summarize_table(file_name, f.read()))
+
+        # Body: raw_files_content, then each file's text. Offsets are in bytes.
+        blobs = [raw_files_content.encode("utf-8")] + [text.encode("utf-8") for _, text in files]
+        offsets, position = [], 0
+        for blob in blobs:
+            offsets.append([position, len(blob)])
+            position += len(blob)
+
+        # Fact index: every line with a number in it, by term.
+        facts, fact_terms = [], {}
+        for file_name, text in files:
+            for paragraph in split_paragraphs(text):
+                for line in paragraph.splitlines():
+                    line = line.strip("-*# ").strip()
+                    if re.search(r"\d", line):
+                        for term in set(tokenize(line)):
+                            fact_terms.setdefault(term, []).append(len(facts))
+                        facts.append({"text": line, "file": file_name})
+
+        header = {
+            "name": name,
+            "source": os.path.abspath(folder),
+            "source_fingerprint": fingerprint_folder(folder),
+            "built_at": time.time(),
+            "user_request": user_request,
+            "dedup_stats": dedup_stats,
+            "raw_files_content": offsets[0],
+            "files": [{"name": file_name, "span": span_} for (file_name, _), span_ in zip(files, offsets[1:])],
+            "tables": tables,
+            "facts": facts,
+            "fact_terms": fact_terms,
+        }
+        header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+
+        path = bundle_path(name)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(PREAMBLE.pack(MAGIC, len(header_bytes)))
+            f.write(header_bytes)
+            for blob in blobs:
+                f.write(blob)
+        os.replace(tmp, path)
+        span.set(files=len(files), facts=len(facts), bytes=os.path.getsize(path))
+    return path
+
+
+class Bundle:
+    """A read-only, memory-mapped bundle. Text is decoded from the mapping on access."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_len = PREAMBLE.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a workspace bundle")
+        self._body = PREAMBLE.size + header_len
+        self.header = json.loads(self._mm[PREAMBLE.size:self._body])
+
+    def _read(self, span):
+        start, length = span
+        with memoryview(self._mm)[self._body + start:self._body + start + length] as view:
+            return str(view, "utf-8")
+
+    @property
+    def name(self):
+        return self.header["name"]
+
+    @property
+    def user_request(self):
+        return self.header["user_request"]
+
+    @property
+    def dedup_stats(self):
+        return self.header["dedup_stats"]
+
+    @property
+    def tables(self):
+        return self.header["tables"]
+
+    @property
+    def raw_files_content(self):
+        return self._read(self.header["raw_files_content"])
+
+    def files(self):
+        """[(file_name, deduplicated text), ...] -- for merging with extra uploads."""
+        return [(f["name"], self._read(f["span"])) for f in self.header["files"]]
+
+    def find_facts(self, query, k=10, exclude=""):
+        """Numeric fact lines sharing the most terms with `query`, skipping any found in `exclude`."""
+        counts = {}
+        for term in set(tokenize(query)):
+            for fact_id in self.header["fact_terms"].get(term, ()):
+                counts[fact_id] = counts.get(fact_id, 0) + 1
+        facts = []
+        for fact_id in sorted(counts, key=lambda fact_id: (-counts[fact_id], fact_id)):
+            fact = self.header["facts"][fact_id]
+            if fact["text"] not in exclude and fact not in facts:
+                facts.append(fact)
+                if len(facts) == k:
+                    break
+        return facts
+
+    def prompt_supplement(self, query, raw_files_content, k=FACTS_IN_PROMPT):
+        """
+        Sections to append to `raw_files_content`: table summaries, and the
+        facts best matching `query` that truncation left out of it.
+        """
+        sections = []
+        if self.tables:
+            lines = []
+            for table in self.tables:
+                stats = "; ".join(
+                    f"{column} min {v['min']:g} / max {v['max']:g} / mean {v['mean']:g}"
+                    for column, v in table["numeric"].items()
+                )
+                lines.append(f"- {table['file']}: {table['rows']} rows; columns: {', '.join(table['columns'])}"
+                             + (f"; {stats}" if stats else ""))
+            sections.append("TABLE SUMMARIES:\n" + "\n".join(lines))
+        facts = self.find_facts(query, k, exclude=raw_files_content)
+        if facts:
+            sections.append("KEY FIGURES (cut from the files above for length):\n"
+                            + "\n".join(f"- [{fact['file']}] {fact['text']}" for fact in facts))
+        return "".join(f"\n\n{section}" for section in sections)
+
+    def is_stale(self):
+        """True when the source folder still exists and has changed since the build."""
+        source = self.header["source"]
+        return os.path.isdir(source) and fingerprint_folder(source) != self.header["source_fingerprint"]
+
+    def close(self):
+        self._mm.close()
+
+
+_open_bundles = {}
+_open_lock = threading.Lock()
+
+
+def list_bundles():
+    if not os.path.isdir(BUNDLE_DIR):
+        return []
+    return sorted(name[:-len(".bundle")] for name in os.listdir(BUNDLE_DIR) if name.endswith(".bundle"))
+
+
+def open_bundle(name):
+    """
+    Process-wide handle for a bundle, reused across Streamlit reruns and sessions.
+    A rebuilt bundle (new mtime) is remapped on the next call.
+    """
+    path = bundle_path(name)
+    mtime = os.path.getmtime(path)
+    with _open_lock:
+        cached = _open_bundles.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with tracer.span("bundle.open", bundle=name):
+            bundle = Bundle(path)
+        # The old mapping is left to the GC: a running session may still read from it.
+        _open_bundles[path] = (mtime, bundle)
+        return bundle
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build")
+    build.add_argument("folder")
+    build.add_argument("--name", help="Bundle name (default: folder name).")
+    sub.add_parser("list")
+    show = sub.add_parser("show")
+    show.add_argument("name")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        start = time.perf_counter()
+        path = build_bundle(args.folder, args.name)
+        print(f"📦 {path} ({os.path.getsize(path) / 1024:.1f} KB, {time.perf_counter() - start:.2f}s)")
+    elif args.command == "list":
+        for name in list_bundles():
+            bundle = open_bundle(name)
+            flag = "  (stale: rebuild)" if bundle.is_stale() else ""
+            print(f"{name:<36}{len(bundle.header['files']):>3} files {len(bundle.header['facts']):>5} facts{flag}")
+    elif args.command == "show":
+        bundle = open_bundle(args.name)
+        summary = {key: bundle.header[key] for key in ("name", "source", "user_request", "dedup_stats", "tables")}
+        summary["files"] = [f["name"] for f in bundle.header["files"]]
+        summary["facts"] = len(bundle.header["facts"])
+        print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
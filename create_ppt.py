@@ -1,12 +1,19 @@
 import copy
 from io import BytesIO
 import math
+import time
 from pptx import Presentation
 from pptx.util import Pt, Inches
 from pptx.dml.color import RGBColor
 from pptx.enum.shapes import MSO_SHAPE
 from pptx.enum.text import PP_ALIGN, MSO_ANCHOR
 
+from metrics import registry
+
+BUILD_SECONDS = registry.histogram("pptx_build_seconds", "Time to lay out all slides of a deck.")
+SAVE_SECONDS = registry.histogram("pptx_save_seconds", "Time to serialize a deck to .pptx.")
+SLIDES_RENDERED = registry.counter("pptx_slides_rendered_total", "Slides laid out by generate_pptx.")
+
 # --- MCKINSEY-STYLE PALETTE ---
 NAVY_BG = RGBColor(15, 23, 42)       # Dark Navy
 WHITE_TEXT = RGBColor(255, 255, 255) # White
@@ -174,14 +181,14 @@ def create_smart_content_slide(prs, slide_data):
         notes_slide = slide.notes_slide # This creates the notes slide if missing
         notes_slide.notes_text_frame.text = notes_text
 
-def generate_pptx(json_data, template_file=None):
+def build_presentation(json_data, template_file=None):
+    """Lays out every slide of the plan. Returns None when the plan has no slides."""
     # Setup
     prs = Presentation() 
     
     slides_data = json_data.get("slides", [])
     if not slides_data:
-        # Fallback if no slides found
-        return BytesIO()
+        return None
 
     # 1. Title Slide (Assumes first slide in JSON is title)
     create_title_slide(prs, slides_data[0])
@@ -190,9 +197,26 @@ def generate_pptx(json_data, template_file=None):
     if len(slides_data) > 1:
         for i in range(1, len(slides_data)):
             create_smart_content_slide(prs, slides_data[i])
+    return prs
 
-    # Export
+def save_presentation(prs):
+    """Serializes the deck into an in-memory .pptx stream."""
     pptx_stream = BytesIO()
     prs.save(pptx_stream)
     pptx_stream.seek(0)
-    return pptx_stream
\ No newline at end of file
+    return pptx_stream
+
+def generate_pptx(json_data, template_file=None):
+    start = time.perf_counter()
+    prs = build_presentation(json_data, template_file)
+    if prs is None:
+        # Fallback if no slides found
+        return BytesIO()
+    built = time.perf_counter()
+    BUILD_SECONDS.observe(built - start)
+    SLIDES_RENDERED.inc(len(prs.slides))
+
+    # Export
+    pptx_stream = save_presentation(prs)
+    SAVE_SECONDS.observe(time.perf_counter() - built)
+    return pptx_stream
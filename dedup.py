@@ -0,0 +1,137 @@
+"""
+Near-duplicate paragraph elimination across uploaded sources.
+
+Drafts are often uploaded next to the notes they were written from, and email
+chains repeat quoted replies. Each paragraph is shingled into word 5-grams,
+MinHashed, and bucketed with LSH; a paragraph whose estimated Jaccard
+similarity to an earlier one is >= THRESHOLD is dropped, and the kept
+(canonical) copy is tagged with the other sources it appeared in.
+
+Only the first MAX_CHARS of each file are deduplicated: the prompt keeps
+TRUNCATE_CHARS per file anyway, and pure-Python MinHash over a 500 KB upload
+takes seconds.
+"""
+import hashlib
+import re
+
+from ingest import TRUNCATE_CHARS, truncate_text
+from tracing import tracer
+
+SHINGLE_SIZE = 5     # words per shingle
+NUM_PERM = 64        # MinHash signature length
+BANDS = 16           # LSH bands (NUM_PERM / BANDS rows each)
+THRESHOLD = 0.8      # estimated Jaccard similarity to count as a duplicate
+MIN_WORDS = 8        # shorter paragraphs (headings, sign-offs) are always kept
+MAX_CHARS = 4 * TRUNCATE_CHARS  # per file; headroom for what dedup removes before truncation
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _permutations(n):
+    # Fixed, seed-derived coefficients so signatures are stable across processes.
+    perms = []
+    for i in range(n):
+        digest = hashlib.blake2b(f"minhash-{i}".encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], "little") % (_MERSENNE_PRIME - 1) + 1
+        b = int.from_bytes(digest[8:], "little") % _MERSENNE_PRIME
+        perms.append((a, b))
+    return perms
+
+
+_PERMS = _permutations(NUM_PERM)
+
+
+def split_paragraphs(text):
+    return [p for p in re.split(r"\n\s*\n", text) if p.strip()]
+
+
+def normalize_words(paragraph):
+    """Lower-cased words with quote markers ('>'), thousands separators and punctuation removed."""
+    lines = [re.sub(r"^\s*(>\s*)+", "", line) for line in paragraph.splitlines()]
+    text = re.sub(r"(?<=\d),(?=\d)", "", " ".join(lines).lower())
+    return re.findall(r"[a-z0-9$%.]+", text)
+
+
+def shingles(words, k=SHINGLE_SIZE):
+    if len(words) <= k:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+def minhash(shingle_set):
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "little") for s in shingle_set]
+    return tuple(
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMS
+    )
+
+
+def similarity(sig_a, sig_b):
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+
+def dedupe_sources(files, threshold=THRESHOLD, max_chars=MAX_CHARS):
+    """
+    Removes near-duplicate paragraphs across (and within) sources.
+    `files` is a list of (file_name, text); earlier files win ties. Text past
+    `max_chars` (None = no cap) is cut off, as truncate_text would do later.
+    Returns (deduped_files, stats).
+    """
+    with tracer.span("dedupe", files=len(files)) as span:
+        rows = NUM_PERM // BANDS
+        buckets = {}          # (band, band_hash) -> [paragraph ids]
+        signatures = []       # paragraph id -> signature
+        also_in = {}          # canonical paragraph id -> [source names]
+        kept = []             # [(file_name, [(paragraph id or None, text), ...]), ...]
+        stats = {"paragraphs": 0, "duplicates_removed": 0, "chars_removed": 0, "chars_saved": 0, "tokens_saved": 0, "chars_skipped": 0}
+        prompt_chars_before = sum(len(truncate_text(text)) for _, text in files)
+
+        for name, text in files:
+            file_paragraphs = []
+            if max_chars is not None and len(text) > max_chars:
+                stats["chars_skipped"] += len(text) - max_chars
+                text = text[:max_chars] + "\n\n[TRUNCATED]"
+            for paragraph in split_paragraphs(text):
+                stats["paragraphs"] += 1
+                words = normalize_words(paragraph)
+                if len(words) < MIN_WORDS:
+                    file_paragraphs.append((None, paragraph))
+                    continue
+
+                sig = minhash(shingles(words))
+                bands = [(band, sig[band * rows:(band + 1) * rows]) for band in range(BANDS)]
+                candidates = {pid for key in bands for pid in buckets.get(key, ())}
+                match = max(candidates, key=lambda pid: similarity(sig, signatures[pid]), default=None)
+
+                if match is not None and similarity(sig, signatures[match]) >= threshold:
+                    stats["duplicates_removed"] += 1
+                    stats["chars_removed"] += len(paragraph)
+                    if name not in also_in[match]:
+                        also_in[match].append(name)
+                    continue
+
+                pid = len(signatures)
+                signatures.append(sig)
+                also_in[pid] = [name]
+                for key in bands:
+                    buckets.setdefault(key, []).append(pid)
+                file_paragraphs.append((pid, paragraph))
+            kept.append((name, file_paragraphs))
+
+        deduped = []
+        for name, file_paragraphs in kept:
+            out = []
+            for pid, paragraph in file_paragraphs:
+                others = [n for n in also_in.get(pid, []) if n != name]
+                if others:
+                    paragraph = f"{paragraph}\n[also in: {', '.join(others)}]"
+                out.append(paragraph)
+            deduped.append((name, "\n\n".join(out) or "[All content duplicates other sources.]"))
+
+        # What the Analyst prompt actually shrinks by, after per-file truncation. Removed
+        # paragraphs past the cut were never sent, and freed room pulls in text that was.
+        stats["chars_saved"] = prompt_chars_before - sum(len(truncate_text(text)) for _, text in deduped)
+        stats["tokens_saved"] = stats["chars_saved"] // 4  # ~4 chars per token
+        span.set(**stats)
+    return deduped, stats
@@ -0,0 +1,86 @@
+import os
+from io import BytesIO
+
+from tracing import tracer
+
+SUPPORTED_SUFFIXES = {".pdf", ".csv", ".xlsx", ".xls", ".txt", ".md"}
+TRUNCATE_CHARS = 12000  # per file, in the Analyst prompt
+
+
+def truncate_text(text, limit=TRUNCATE_CHARS):
+    if len(text) <= limit:
+        return text
+    return text[:limit] + "\n\n[TRUNCATED]"
+
+
+def read_file(name, data):
+    """Parses raw file bytes into plain text based on the file extension."""
+    with tracer.span("parse.file", file=name, bytes=len(data)):
+        return _parse(name, data)
+
+
+def _parse(name, data):
+    suffix = os.path.splitext(name)[1].lower()
+
+    # Parsers are imported on first use of their file type (pandas alone is ~0.5s).
+    if suffix == ".pdf":
+        from pypdf import PdfReader
+        reader = PdfReader(BytesIO(data))
+        pages = [page.extract_text() or "" for page in reader.pages]
+        return "\n".join(pages)
+
+    if suffix in {".csv"}:
+        import pandas as pd
+        df = pd.read_csv(BytesIO(data))
+        return df.to_csv(index=False)
+
+    if suffix in {".xlsx", ".xls"}:
+        import pandas as pd
+        df = pd.read_excel(BytesIO(data))
+        return df.to_csv(index=False)
+
+    if suffix in {".txt", ".md"}:
+        return data.decode("utf-8", errors="ignore")
+
+    return f"Unsupported file type: {suffix}"
+
+
+def read_uploaded_file(uploaded_file):
+    return read_file(uploaded_file.name, uploaded_file.getvalue())
+
+
+def build_raw_content(files, notes=""):
+    """
+    Assembles the `raw_files_content` string the Analyst receives.
+    `files` is a list of (file_name, parsed_text) tuples.
+    """
+    combined_sections = []
+    for name, content in files:
+        combined_sections.append(f"FILE: {name}\n{truncate_text(content)}")
+    if notes.strip():
+        combined_sections.append(f"NOTES:\n{notes.strip()}")
+    if not combined_sections:
+        combined_sections.append("No files or notes were provided.")
+    return "\n\n".join(combined_sections)
+
+
+def load_case_folder(folder):
+    """
+    Reads a data pack laid out like the `sample_data/` cases:
+    a `*-prompt.txt` holding the user goal, plus any supported source files.
+    Returns (user_request, [(file_name, parsed_text), ...]).
+    """
+    user_request = ""
+    files = []
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        suffix = os.path.splitext(name)[1].lower()
+        if name.startswith(".") or not os.path.isfile(path) or suffix not in SUPPORTED_SUFFIXES:
+            continue
+        with open(path, "rb") as f:
+            data = f.read()
+        if name.endswith("-prompt.txt"):
+            user_request = data.decode("utf-8", errors="ignore").strip()
+            continue
+        files.append((name, read_file(name, data)))
+    return user_request, files
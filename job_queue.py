@@ -0,0 +1,190 @@
+"""
+Local persistent job queue (SQLite) for running graph steps out of process.
+
+The UI enqueues one job per graph step ("start" with the inputs, or "resume"
+with the human feedback); `worker.py` processes claim jobs under a lease, run
+the graph until its next interrupt and record where it paused. A job whose
+worker dies is re-claimed once its lease expires, up to `max_attempts`.
+
+Job status:  queued -> running -> interrupted (paused at a HITL step)
+                                -> done        (workflow finished)
+                                -> queued      (retry after failure, with backoff)
+                                -> failed      (out of attempts)
+"""
+import json
+import os
+import sqlite3
+import time
+
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH")
+LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", 120))
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    thread_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    available_at REAL NOT NULL,
+    next_step TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, available_at);
+CREATE INDEX IF NOT EXISTS jobs_thread ON jobs (thread_id, id);
+"""
+
+
+class JobQueue:
+    def __init__(self, path=JOB_QUEUE_PATH, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        if not path:
+            raise ValueError("JobQueue needs a database path (set JOB_QUEUE_PATH).")
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # isolation_level=None: we issue BEGIN IMMEDIATE ourselves where claims must be atomic.
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def enqueue(self, thread_id, kind, payload=None):
+        now = time.time()
+        with self._connect() as conn:
+            cur = conn.execute(
+                "INSERT INTO jobs (thread_id, kind, payload, max_attempts, available_at, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (thread_id, kind, json.dumps(payload or {}), self.max_attempts, now, now),
+            )
+            return cur.lastrowid
+
+    def claim(self, worker_id):
+        """
+        Atomically leases the oldest runnable job, or returns None. Jobs whose
+        lease expired (crashed worker) are runnable again. Only one job per
+        thread_id runs at a time, so graph steps of a thread stay ordered.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Expired leases: retry, or give up when out of attempts.
+            conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END, "
+                "error = COALESCE(error, 'lease expired'), lease_owner = NULL "
+                "WHERE status = 'running' AND lease_expires < ?",
+                (now,),
+            )
+            row = conn.execute(
+                "SELECT * FROM jobs j WHERE status = 'queued' AND available_at <= ? "
+                "AND NOT EXISTS (SELECT 1 FROM jobs r WHERE r.thread_id = j.thread_id AND r.status = 'running') "
+                "AND NOT EXISTS (SELECT 1 FROM jobs e WHERE e.thread_id = j.thread_id AND e.id < j.id AND e.status = 'queued') "
+                "ORDER BY id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_owner = ?, lease_expires = ?, "
+                "started_at = COALESCE(started_at, ?) WHERE id = ?",
+                (worker_id, now + self.lease_seconds, now, row["id"]),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return self.get(row["id"])
+
+    def heartbeat(self, job_id, worker_id):
+        """Extends the lease. Returns False if the job was taken away from this worker."""
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND lease_owner = ? AND status = 'running'",
+                (time.time() + self.lease_seconds, job_id, worker_id),
+            )
+            return cur.rowcount == 1
+
+    def complete(self, job_id, worker_id, next_step=None):
+        """Marks the step finished: 'interrupted' if the graph paused at `next_step`, else 'done'."""
+        status = "interrupted" if next_step else "done"
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, next_step = ?, finished_at = ?, lease_owner = NULL, error = NULL "
+                "WHERE id = ? AND lease_owner = ?",
+                (status, next_step, time.time(), job_id, worker_id),
+            )
+
+    def fail(self, job_id, worker_id, error):
+        """Requeues with exponential backoff, or marks the job failed when out of attempts."""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            if row["attempts"] >= row["max_attempts"]:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, lease_owner = NULL "
+                    "WHERE id = ? AND lease_owner = ?",
+                    (error, now, job_id, worker_id),
+                )
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', error = ?, available_at = ?, lease_owner = NULL "
+                    "WHERE id = ? AND lease_owner = ?",
+                    (error, now + min(60, 2 ** row["attempts"]), job_id, worker_id),
+                )
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _to_dict(row)
+
+    def latest_for_thread(self, thread_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE thread_id = ? ORDER BY id DESC LIMIT 1", (thread_id,)
+            ).fetchone()
+        return _to_dict(row)
+
+    def counts(self):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+
+def _to_dict(row):
+    if row is None:
+        return None
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    return job
+
+
+_queue = None
+
+
+def get_queue():
+    """Process-wide queue when JOB_QUEUE_PATH is set, else None (run graphs in-process)."""
+    global _queue
+    if _queue is None and JOB_QUEUE_PATH:
+        if not os.getenv("CHECKPOINT_DB"):
+            # Workers would checkpoint somewhere this process can't read: every run would look finished and empty.
+            raise RuntimeError("JOB_QUEUE_PATH is set but CHECKPOINT_DB is not; set both so the UI and workers share graph checkpoints.")
+        _queue = JobQueue()
+    return _queue
@@ -1,6 +1,17 @@
+import argparse
+import getpass
 import json
-from agent_logic import app
-from create_ppt import generate_pptx
+import os
+import sys
+import tempfile
+import time
+from uuid import uuid4
+
+import agent_logic
+import budget
+import slide_library
+from agent_logic import get_app, save_approved_plan
+from session_recorder import compare, load_session, start_recording, summarize
 
 # 1. SETUP INPUTS
 
@@ -14,68 +25,212 @@ Marketing Spend: $2M (On budget)
 Competitor Activity: High aggressive pricing in July.
 """
 
-config = {"configurable": {"thread_id": "interactive_mode_vFinal"}}
-inputs = {"user_request": user_chat, "raw_files_content": file_content}
-
-print("--- STARTING INTERACTIVE AGENT ---")
-print("(Type 'quit' at any time to exit)")
-
-# Start the workflow
-cursor = app.stream(inputs, config=config)
-resume_needed = False
+APPROVE = "Proceed with this strategy."
 
-while True:
-    try:
-        # A. Run until pause
-        if resume_needed:
-            cursor = app.stream(None, config=config)
-        
-        for event in cursor:
-            pass # Just let it run to the next pause
 
-    except Exception as e:
-        print(f"Error: {e}")
-        break
-
-    # B. Check State
-    snapshot = app.get_state(config)
-    
-    if not snapshot.next:
-        print("\n🎉 WORKFLOW FINISHED!")
-        final_state = snapshot.values
-        if 'narrative_plan' in final_state:
-            print("🔨 Generating PowerPoint...")
-            generate_pptx(final_state['narrative_plan'], filename="Final_Deck.pptx")
-        break
-
-    # C. Show Context & Ask User
-    current_step = snapshot.next[0]
-    print(f"\n⏸️ PAUSED BEFORE: {current_step.upper()}")
-    
-    state_values = snapshot.values
-    
-    if current_step == "story_architect":
+def ask_user(current_step, state_values):
+    """Interactive feedback prompt. Returns None when the user quits."""
+    if current_step == "human_review":
         print("\n🧐 ANALYST REPORT TO REVIEW:")
         print(state_values.get('analysis_report'))
-        
+
     elif current_step == "critique":
         print("\n🧐 SLIDES TO REVIEW:")
         plan = state_values.get('narrative_plan', {})
         print(json.dumps(plan.get('slides', []), indent=2))
 
-    # D. Input Loop
     user_feedback = input("\n👤 YOUR FEEDBACK (Press Enter to Approve, or type changes): ")
-    
+
     if user_feedback.lower() in ["quit", "exit"]:
-        break
-    
+        return None
+
     if user_feedback.strip() == "":
-        user_feedback = "Proceed with this strategy."
+        user_feedback = APPROVE
         print("✅ Approved. Continuing...")
     else:
         print(f"📝 Feedback Recorded: {user_feedback}")
+    return user_feedback
+
+
+def run_session(inputs, thread_id, get_feedback, recorder=None, output="Final_Deck.pptx", verbose=True, save_to_library=True):
+    """
+    Drives the graph to completion. `get_feedback(step, values)` is called at
+    each interrupt and returns the feedback string (None aborts the run).
+    Returns True if the workflow finished.
+    """
+    from create_ppt import generate_pptx
+
+    app = get_app()
+    config = {"configurable": {"thread_id": thread_id}}
+    if recorder:
+        recorder.record("input", inputs=inputs)
+
+    # Start the workflow
+    cursor = app.stream(inputs, config=config)
+
+    while True:
+        # A. Run until pause
+        for event in cursor:
+            pass # Just let it run to the next pause
+
+        # B. Check State
+        snapshot = app.get_state(config)
+
+        if not snapshot.next:
+            if verbose:
+                for notice in (snapshot.values.get("ledger") or {}).get("notices", []):
+                    print(f"💸 BUDGET: {notice}")
+                print("\n🎉 WORKFLOW FINISHED!")
+            final_state = snapshot.values
+            if save_to_library:
+                save_approved_plan(final_state)
+            if 'narrative_plan' in final_state:
+                if verbose:
+                    print("🔨 Generating PowerPoint...")
+                start = time.perf_counter()
+                pptx_stream = generate_pptx(final_state['narrative_plan'])
+                if recorder:
+                    recorder.record("render", seconds=time.perf_counter() - start,
+                                    pptx_bytes=len(pptx_stream.getbuffer()))
+                if output:
+                    with open(output, "wb") as f:
+                        f.write(pptx_stream.getvalue())
+            return True
+
+        # C. Show Context & Ask User
+        current_step = snapshot.next[0]
+        if verbose:
+            print(f"\n⏸️ PAUSED BEFORE: {current_step.upper()}")
+
+        # D. Input Loop (time spent at the prompt is not part of the run's latency)
+        if recorder:
+            recorder.pause()
+        user_feedback = get_feedback(current_step, snapshot.values)
+        if user_feedback is None:
+            return False
+        if recorder:
+            recorder.record("feedback", step=current_step, text=user_feedback, wait_s=recorder.resume())
+
+        # E. Update State & Resume
+        app.update_state(config, {"human_feedback": user_feedback})
+        cursor = app.stream(None, config=config)
+        if verbose:
+            print("-" * 50)
+
+
+def warm_up():
+    """
+    Pays the lazy-import / graph-compile cost up front so it isn't timed as
+    overhead. Recording and replaying must both call it, or they don't compare.
+    """
+    import create_ppt
+    get_app()
+    return agent_logic.get_llm()
+
+
+def replay_session(path, live=False, latency_tolerance=0.25, token_tolerance=0.10, extra_loops=0):
+    """
+    Re-executes a recorded session headlessly. With recorded responses the
+    LLM is replaced by `ReplayChatModel`, so only framework overhead is timed;
+    with `live=True` the model is re-queried and full wall time is compared.
+    Returns a list of regressions (empty = pass).
+    """
+    events = load_session(path)
+    baseline = next((e["summary"] for e in events if e["type"] == "end"), None) or summarize(events)
+    inputs = next(e["inputs"] for e in events if e["type"] == "input")
+    feedback = [e for e in events if e["type"] == "feedback"]
+
+    # Like benchmark.py: keep replays out of the real usage ledger and slide library.
+    budget.use_usage_db(os.path.join(tempfile.mkdtemp(prefix="replay_"), "usage.db"))
+    slide_library.disable_library()
+
+    if not live:
+        from mock_llm import ReplayChatModel
+        agent_logic.llm = ReplayChatModel(responses=[e for e in events if e["type"] == "llm"])
+
+    def replay_feedback(step, values):
+        if not feedback:
+            raise RuntimeError(f"Replay log has no feedback left for the pause before '{step}'.")
+        event = feedback.pop(0)
+        if event["step"] != step:
+            raise RuntimeError(f"Replay diverged: paused before '{step}', log expects '{event['step']}'.")
+        return event["text"]
+
+    warm_up()
+
+    thread_id = f"replay_{uuid4().hex[:8]}"
+    recorder = start_recording(thread_id)
+    finished = run_session(inputs, thread_id, replay_feedback, recorder=recorder, output=None, verbose=False, save_to_library=False)
+    recorder.close()
+    current = recorder.summary()
+
+    latency_key = "wall_seconds" if live else "overhead_seconds"
+    failures = [] if finished else ["replay did not reach the end of the workflow"]
+    failures += compare(baseline, current, latency_tolerance, token_tolerance, extra_loops, latency_key)
+
+    print(f"recorded: {json.dumps(baseline)}")
+    print(f"replayed: {json.dumps(current)}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Terminal version of the storytelling copilot.")
+    parser.add_argument("--record", metavar="PATH", help="Record inputs, feedback and LLM responses to a JSONL log.")
+    parser.add_argument("--replay", metavar="PATH", help="Headlessly replay a recorded session and check for regressions.")
+    parser.add_argument("--live", action="store_true", help="With --replay: re-query the model instead of using recorded responses.")
+    parser.add_argument("--max-latency-regression", type=float, default=0.25, help="Allowed latency increase (fraction).")
+    parser.add_argument("--max-token-regression", type=float, default=0.10, help="Allowed token usage increase (fraction).")
+    parser.add_argument("--max-extra-loops", type=int, default=0, help="Allowed extra LLM calls vs the recording.")
+    parser.add_argument("--bundle", metavar="NAME", help="Start from a prebuilt data pack (see bundle.py) instead of the demo inputs.")
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        failures = replay_session(
+            args.replay,
+            live=args.live,
+            latency_tolerance=args.max_latency_regression,
+            token_tolerance=args.max_token_regression,
+            extra_loops=args.max_extra_loops,
+        )
+        for failure in failures:
+            print(f"❌ REGRESSION: {failure}")
+        if failures:
+            sys.exit(1)
+        print("✅ Replay within thresholds.")
+        return
+
+    thread_id = "interactive_mode_vFinal"
+    inputs = {"user_request": user_chat, "raw_files_content": file_content, "user_id": getpass.getuser()}
+    if args.bundle:
+        from bundle import list_bundles, open_bundle
+        try:
+            pack = open_bundle(args.bundle)
+        except FileNotFoundError:
+            sys.exit(f"No bundle named '{args.bundle}'. Available: {', '.join(list_bundles()) or 'none'} "
+                     f"(build one with `python bundle.py build FOLDER`).")
+        if pack.is_stale():
+            print(f"⚠️ Bundle '{args.bundle}' is older than its source folder; rebuild with `python bundle.py build`.")
+        request = pack.user_request or user_chat
+        raw_files_content = pack.raw_files_content
+        inputs.update(user_request=request, raw_files_content=raw_files_content + pack.prompt_supplement(request, raw_files_content))
+    recorder = None
+    if args.record:
+        llm = warm_up()
+        model = getattr(llm, "model_name", type(llm).__name__)
+        recorder = start_recording(thread_id, args.record, model=model)
+
+    print("--- STARTING INTERACTIVE AGENT ---")
+    print("(Type 'quit' at any time to exit)")
+
+    try:
+        run_session(inputs, thread_id, ask_user, recorder=recorder)
+    except Exception as e:
+        print(f"Error: {e}")
+    finally:
+        if recorder:
+            recorder.close()
+            print(f"💾 Session recorded to {args.record}")
+
 
-    # E. Update State & Resume
-    app.update_state(config, {"human_feedback": user_feedback})
-    resume_needed = True
-    print("-" * 50)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+In-process metrics registry with Prometheus text exposition.
+
+Counters, gauges and histograms (fixed buckets, so p50/p95/p99 come from
+`histogram_quantile()` on the scraper side) are updated on the hot paths with
+one lock and a bisect, nothing else. Every span in tracing.py feeds
+`span_duration_seconds`, so node, LLM, checkpoint and export latencies need no
+extra instrumentation.
+
+    METRICS_PORT=9464               serve http://localhost:9464/metrics
+    METRICS_FILE=metrics-{pid}.prom dump to a file every METRICS_DUMP_SECONDS (default 15)
+"""
+import bisect
+import os
+import resource
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PORT = os.getenv("METRICS_PORT")
+METRICS_FILE = os.getenv("METRICS_FILE")
+METRICS_DUMP_SECONDS = float(os.getenv("METRICS_DUMP_SECONDS", 15))
+
+# Seconds; covers sub-ms parses up to multi-minute LLM loops.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ""
+    escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def samples(self):
+        """[(suffix, label key, extra labels, value), ...] for exposition."""
+        with self._lock:
+            return [("", key, (), value) for key, value in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Set explicitly, or pass `fn` to compute the value at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labelnames=(), fn=None):
+        super().__init__(name, help_text, labelnames)
+        self.fn = fn
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(self.labelnames, labels)] = value
+
+    def samples(self):
+        if self.fn is not None:
+            try:
+                return [("", (), (), float(self.fn()))]
+            except Exception:
+                return []
+        return super().samples()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # per-bucket counts (last one is +Inf), then sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def samples(self):
+        with self._lock:
+            values = {key: list(counts) for key, counts in self._values.items()}
+        out = []
+        for key, counts in values.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts[:-1]):
+                cumulative += n
+                out.append(("_bucket", key, (("le", "+Inf" if bound == float("inf") else f"{bound:g}"),), cumulative))
+            out.append(("_sum", key, (), counts[-1]))
+            out.append(("_count", key, (), cumulative))
+        return out
+
+    def quantile(self, q, **labels):
+        """Bucket-interpolated quantile, same estimate as Prometheus' histogram_quantile()."""
+        with self._lock:
+            counts = list(self._values.get(_label_key(self.labelnames, labels), []))
+        total = sum(counts[:-1])
+        if not total:
+            return None
+        rank, cumulative, lower = q * total, 0, 0.0
+        for bound, n in zip(self.buckets + (self.buckets[-1],), counts[:-1]):
+            if n and cumulative + n >= rank:
+                return lower + (bound - lower) * (rank - cumulative) / n
+            cumulative += n
+            lower = bound
+        return self.buckets[-1]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        # Re-registering returns the existing metric, so Streamlit reruns are safe.
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, *args, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter, name, help_text, labelnames)
+
+    def gauge(self, name, help_text, labelnames=(), fn=None):
+        return self._register(Gauge, name, help_text, labelnames, fn=fn)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """Atomic write, so a scraper never reads a half-written file."""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+
+def current_rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # No procfs (macOS): fall back to peak RSS, which is reported in bytes there.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+registry = Registry()
+
+SPAN_SECONDS = registry.histogram("span_duration_seconds", "Duration of traced spans (graph nodes, LLM calls, checkpoints, exports).", ["span"])
+registry.gauge("process_resident_memory_bytes", "Resident set size of this process.", fn=current_rss_bytes)
+_START_TIME = time.time()
+registry.gauge("process_start_time_seconds", "Start time of this process (unix seconds).", fn=lambda: _START_TIME)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+_exporter_started = False
+_exporter_lock = threading.Lock()
+
+
+def start_exporter(port=METRICS_PORT, path=METRICS_FILE, interval=METRICS_DUMP_SECONDS):
+    """
+    Starts the HTTP endpoint and/or the periodic file dump, once per process.
+    A `{pid}` in the file name keeps worker processes from overwriting each other.
+    """
+    global _exporter_started
+    with _exporter_lock:
+        if _exporter_started:
+            return
+        _exporter_started = True
+
+    if port:
+        try:
+            server = ThreadingHTTPServer(("", int(port)), _Handler)
+        except OSError as exc:
+            print(f"⚠️ Metrics endpoint not started on port {port}: {exc}")
+        else:
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+
+    if path:
+        path = path.replace("{pid}", str(os.getpid()))
+
+        def dump_loop():
+            while True:
+                registry.dump(path)
+                time.sleep(interval)
+
+        threading.Thread(target=dump_loop, name="metrics-dump", daemon=True).start()
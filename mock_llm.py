@@ -0,0 +1,183 @@
+import hashlib
+import json
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+@dataclass(frozen=True)
+class LatencyProfile:
+    """Simulated model speed: time to first token + streaming rate."""
+    ttft: float               # seconds before the first token arrives
+    tokens_per_second: float  # 0 = emit everything instantly
+
+
+# --- BUILT-IN PROFILES ---
+PROFILES = {
+    "instant": LatencyProfile(ttft=0.0, tokens_per_second=0),
+    "fast": LatencyProfile(ttft=0.05, tokens_per_second=400),
+    "gpt-4o": LatencyProfile(ttft=0.6, tokens_per_second=80),
+    "slow": LatencyProfile(ttft=2.0, tokens_per_second=25),
+}
+
+
+def resolve_profile(spec):
+    """
+    Accepts a profile name ("fast") or an explicit "ttft:tokens_per_second"
+    pair ("0.3:120"). Empty / truthy flags like "1" map to "instant".
+    """
+    if isinstance(spec, LatencyProfile):
+        return spec
+    spec = (spec or "instant").strip()
+    if spec in PROFILES:
+        return PROFILES[spec]
+    if ":" in spec:
+        ttft, tps = spec.split(":", 1)
+        return LatencyProfile(ttft=float(ttft), tokens_per_second=float(tps))
+    return PROFILES["instant"]
+
+
+def estimate_tokens(text):
+    """Cheap ~4 chars/token heuristic, good enough for relative benchmarks."""
+    return max(1, len(text) // 4)
+
+
+def _seed(text):
+    return int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def _extract(prompt, label):
+    match = re.search(rf"{label}:\s*(.+)", prompt)
+    return match.group(1).strip() if match else ""
+
+
+# --- CANNED RESPONSES ---
+def fake_analysis(prompt):
+    """Deterministic strategy report built from the numbers found in the prompt."""
+    goal = _extract(prompt, "USER GOAL") or "the requested deck"
+    feedback = _extract(prompt, "Feedback")
+    figures = re.findall(r"\$?\d[\d,.]*\s?(?:%|M|B|K|USD)?", prompt)
+    figures = [f.strip() for f in figures if len(f.strip()) > 1][:6]
+    variant = _seed(prompt) % 3
+
+    lines = [
+        "## Core Strategy",
+        f"Build the narrative around: {goal}",
+        "",
+        "## Gaps",
+        "- Downside scenario is not quantified.",
+        "- Ownership of next steps is unclear.",
+        "",
+        "## Recommendation",
+        ["Lead with the answer, then the evidence.",
+         "Open with the market context, close with the ask.",
+         "Frame the decision as a staged bet."][variant],
+    ]
+    if figures:
+        lines += ["", "Key figures: " + ", ".join(figures)]
+    if feedback:
+        lines += ["", f"Revised per feedback: {feedback}"]
+    return "\n".join(lines)
+
+
+def fake_plan(prompt, num_slides=3):
+    """Deterministic slide plan in the JSON shape `story_node` expects."""
+    seed = _seed(prompt)
+    report = prompt.split("Based on this report:", 1)[-1]
+    headlines = [l.strip("#- ").strip() for l in report.splitlines() if l.strip().startswith(("##", "-"))]
+    headlines = headlines or ["Executive Summary"]
+
+    slides = []
+    for i in range(num_slides):
+        headline = headlines[(seed + i) % len(headlines)]
+        slides.append({
+            "title": headline if i else f"Executive Summary: {headline}",
+            "bullets": [f"Point {j + 1} on {headline.lower()}" for j in range(3 + (seed + i) % 3)],
+            "speaker_notes": f"Walk the board through {headline.lower()}.",
+        })
+    plan = {
+        "design": {"font_family": "Arial", "title_color": "#0F172A", "accent_color": "#38BDF8"},
+        "slides": slides,
+    }
+    return "```json\n" + json.dumps(plan, indent=2) + "\n```"
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline stand-in for `ChatOpenAI`. Returns deterministic Analyst reports or
+    Architect JSON depending on the system prompt, and sleeps according to a
+    `LatencyProfile` so benchmarks see realistic (but repeatable) timings.
+    """
+    profile: Any = "instant"
+    num_slides: int = 3
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def _respond(self, messages):
+        """Returns (completion_text, usage_metadata) for a prompt."""
+        system = " ".join(m.content for m in messages if m.type == "system")
+        prompt = "\n".join(m.content for m in messages if m.type != "system")
+        if "JSON" in system:
+            text = fake_plan(prompt, self.num_slides)
+        else:
+            text = fake_analysis(prompt)
+        input_tokens, output_tokens = estimate_tokens(prompt), estimate_tokens(text)
+        usage = {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                 "total_tokens": input_tokens + output_tokens}
+        return text, usage
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        text, usage = self._respond(messages)
+        profile = resolve_profile(self.profile)
+        delay = profile.ttft
+        if profile.tokens_per_second:
+            delay += estimate_tokens(text) / profile.tokens_per_second
+        time.sleep(delay)
+        message = AIMessage(content=text, usage_metadata=usage)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        text, usage = self._respond(messages)
+        profile = resolve_profile(self.profile)
+        time.sleep(profile.ttft)
+
+        # Emit ~4-char "tokens" in batches of 16 to keep sleep overhead low.
+        step = 64
+        for start in range(0, len(text), step):
+            piece = text[start:start + step]
+            if profile.tokens_per_second:
+                time.sleep(estimate_tokens(piece) / profile.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=usage))
+
+
+class ReplayChatModel(FakeChatModel):
+    """
+    Plays back recorded LLM responses (the `llm` events of a session log) in
+    order, including their token usage, so a replay is fully deterministic.
+    """
+    responses: List[dict] = []
+    cursor: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay-chat-model"
+
+    def _respond(self, messages):
+        if self.cursor >= len(self.responses):
+            raise RuntimeError(
+                f"Replay log exhausted after {len(self.responses)} LLM calls; "
+                "the graph is making more calls than the recorded session."
+            )
+        event = self.responses[self.cursor]
+        self.cursor += 1
+        return event["content"], event.get("usage") or {}
@@ -0,0 +1,94 @@
+"""
+Cold-start profiler. Each target is imported in a fresh interpreter with
+`python -X importtime`, so the numbers reflect what a new Streamlit worker
+or CLI process pays before doing any work.
+
+    python profile_imports.py                    # all modules, the app's imports, first graph build
+    python profile_imports.py agent_logic --top 15
+    python profile_imports.py --budget-ms 400    # exit 1 if any target is slower
+"""
+import argparse
+import ast
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def app_imports(path=os.path.join(ROOT, "streamlit_app.py")):
+    """
+    `import ...` code for every module streamlit_app.py imports at top level.
+    Importing the app itself would run the script, so its imports are replayed.
+    """
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        modules += [name for name in names if name not in modules]
+    return "; ".join(f"import {name}" for name in modules)
+
+
+# name -> code executed in the fresh interpreter
+TARGETS = {
+    "agent_logic": "import agent_logic",
+    "ingest": "import ingest",
+    "create_ppt": "import create_ppt",
+    "main": "import main",
+    "streamlit_app": app_imports(),
+    "first_graph_build": "import agent_logic; agent_logic.get_app()",
+}
+
+
+def profile(code):
+    """Returns (wall_ms, [(cumulative_us, self_us, module), ...]) for one cold import."""
+    env = dict(os.environ, MOCK_LLM=os.environ.get("MOCK_LLM", "instant"))
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"`{code}` failed:\n{proc.stderr[-2000:]}")
+
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((int(cumulative_us), int(self_us), name.strip()))
+    return wall_ms, modules
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("targets", nargs="*", help=f"Subset of: {', '.join(TARGETS)}")
+    parser.add_argument("--top", type=int, default=5, help="Heaviest imports to list per target.")
+    parser.add_argument("--budget-ms", type=float, help="Fail if any target's process wall time exceeds this.")
+    args = parser.parse_args(argv)
+
+    over_budget = []
+    for name in args.targets or TARGETS:
+        wall_ms, modules = profile(TARGETS[name])
+        heaviest = sorted(modules, key=lambda m: m[0], reverse=True)[: args.top]
+        print(f"\n{name:<20} wall {wall_ms:>8.0f} ms")
+        for cumulative_us, _, module in heaviest:
+            print(f"    {cumulative_us / 1000:>8.1f} ms  {module}")
+        if args.budget_ms and wall_ms > args.budget_ms:
+            over_budget.append(name)
+
+    if over_budget:
+        print(f"\n❌ Over {args.budget_ms:.0f} ms budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
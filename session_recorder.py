@@ -0,0 +1,145 @@
+"""
+Record-and-replay of HITL sessions.
+
+A recording is a JSONL file with one event per line:
+    {"type": "session",  "thread_id": ..., "model": ...}
+    {"type": "input",    "inputs": {"user_request": ..., "raw_files_content": ...}}
+    {"type": "llm",      "name": "analyst", "content": ..., "usage": {...}, "latency_s": ..., "ttft_s": ...}
+    {"type": "feedback", "step": "human_review", "text": ..., "wait_s": ...}
+    {"type": "render",   "seconds": ..., "pptx_bytes": ..., "wait_s": ...}
+    {"type": "end",      "summary": {...}}
+
+`wait_s` is how long the run sat at an interrupt waiting for a human; it is
+left out of `wall_seconds` and `overhead_seconds`.
+
+`replay_session` in main.py re-drives the graph from these events.
+"""
+import json
+import threading
+import time
+
+# thread_id -> active SessionRecorder
+_active = {}
+_lock = threading.Lock()
+_listener_installed = False
+
+
+def _on_llm(thread_id, name, messages, response, stats):
+    recorder = _active.get(thread_id)
+    if recorder is not None:
+        recorder.record(
+            "llm",
+            name=name,
+            content=response.content,
+            usage=stats["usage"],
+            latency_s=stats["latency_s"],
+            ttft_s=stats["ttft_s"],
+        )
+
+
+class SessionRecorder:
+    """Appends session events to a JSONL file (or just memory when path is None)."""
+
+    def __init__(self, thread_id, path=None, model=None):
+        self.thread_id = thread_id
+        self.path = path
+        self.events = []
+        self.started = time.perf_counter()
+        self._paused_at = None
+        self._file = open(path, "w", encoding="utf-8") if path else None
+        self.record("session", thread_id=thread_id, model=model)
+
+    def record(self, event_type, **fields):
+        event = {"type": event_type, "t": round(time.perf_counter() - self.started, 4), **fields}
+        self.events.append(event)
+        if self._file:
+            self._file.write(json.dumps(event, default=str) + "\n")
+            self._file.flush()
+        return event
+
+    def pause(self):
+        """Marks the start of a wait for human input (feedback or the download click)."""
+        if self._paused_at is None:
+            self._paused_at = time.perf_counter()
+
+    def resume(self):
+        """Ends the current wait. Returns its length in seconds (0 if not paused)."""
+        if self._paused_at is None:
+            return 0.0
+        waited, self._paused_at = time.perf_counter() - self._paused_at, None
+        return round(waited, 4)
+
+    def summary(self):
+        return summarize(self.events, wall_seconds=time.perf_counter() - self.started)
+
+    def close(self):
+        """Writes the `end` event and stops listening for LLM calls."""
+        self.record("end", summary=self.summary())
+        stop_recording(self.thread_id)
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def start_recording(thread_id, path=None, model=None):
+    """Registers a recorder so every LLM call on `thread_id` is captured."""
+    global _listener_installed
+    from agent_logic import add_llm_listener
+
+    with _lock:
+        if not _listener_installed:
+            add_llm_listener(_on_llm)
+            _listener_installed = True
+        recorder = SessionRecorder(thread_id, path, model)
+        _active[thread_id] = recorder
+    return recorder
+
+
+def stop_recording(thread_id):
+    with _lock:
+        _active.pop(thread_id, None)
+
+
+def load_session(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(events, wall_seconds=None):
+    """Loop count, token usage and latency totals for a list of events. Human wait time is excluded."""
+    llm_events = [e for e in events if e["type"] == "llm"]
+    tokens = sum((e.get("usage") or {}).get("total_tokens", 0) for e in llm_events)
+    llm_seconds = sum(e.get("latency_s") or 0 for e in llm_events)
+    if wall_seconds is None:
+        wall_seconds = max((e["t"] for e in events if e["type"] != "end"), default=0)
+    wait_seconds = sum(e.get("wait_s") or 0 for e in events)
+    wall_seconds = max(0.0, wall_seconds - wait_seconds)
+    return {
+        "loops": len(llm_events),
+        "feedback_rounds": sum(1 for e in events if e["type"] == "feedback"),
+        "tokens": tokens,
+        "llm_seconds": round(llm_seconds, 4),
+        "wait_seconds": round(wait_seconds, 4),
+        "wall_seconds": round(wall_seconds, 4),
+        "overhead_seconds": round(max(0.0, wall_seconds - llm_seconds), 4),
+    }
+
+
+def compare(baseline, current, latency_tolerance=0.25, token_tolerance=0.10, extra_loops=0, latency_key="wall_seconds"):
+    """
+    Returns a list of human-readable regressions of `current` vs `baseline`
+    (both `summarize` dicts). Empty list = pass.
+    """
+    failures = []
+    if current["loops"] > baseline["loops"] + extra_loops:
+        failures.append(f"loops {current['loops']} > recorded {baseline['loops']} (+{extra_loops} allowed)")
+    if current["tokens"] > baseline["tokens"] * (1 + token_tolerance):
+        failures.append(f"tokens {current['tokens']} > recorded {baseline['tokens']} (+{token_tolerance:.0%} allowed)")
+    # Small absolute floor so sub-10ms jitter on tiny runs doesn't flap.
+    limit = baseline[latency_key] * (1 + latency_tolerance) + 0.01
+    if current[latency_key] > limit:
+        failures.append(
+            f"{latency_key} {current[latency_key]:.3f}s > recorded {baseline[latency_key]:.3f}s "
+            f"(+{latency_tolerance:.0%} allowed)"
+        )
+    return failures
@@ -0,0 +1,246 @@
+"""
+Persistent library of approved slides.
+
+Every completed run adds its `narrative_plan` slides to a local SQLite file
+(`SLIDE_LIBRARY_PATH`, default `slide_library.db`). An in-memory BM25 index
+over title, bullets and the run's source facts lets the Story Architect pull
+close matches into its prompt and adapt them instead of writing from zero.
+
+    python slide_library.py stats
+    python slide_library.py search "market sizing riyadh"
+    python slide_library.py prune --max-age-days 90 --min-uses 2
+"""
+import argparse
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+SLIDE_LIBRARY_PATH = os.getenv("SLIDE_LIBRARY_PATH", "slide_library.db")
+SLIDE_LIBRARY_ENABLED = os.getenv("SLIDE_LIBRARY", "1") != "0"
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+TITLE_WEIGHT = 2  # title terms count twice
+
+STOPWORDS = {
+    "the", "a", "an", "and", "or", "of", "to", "in", "on", "for", "with", "by", "is", "are",
+    "be", "this", "that", "it", "as", "at", "from", "we", "our", "will", "can", "vs",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS slides (
+    id INTEGER PRIMARY KEY,
+    fingerprint TEXT UNIQUE,
+    title TEXT NOT NULL,
+    bullets TEXT NOT NULL,
+    speaker_notes TEXT,
+    facts TEXT,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    use_count INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+def tokenize(text):
+    return [t for t in re.findall(r"[a-z0-9%$]+", (text or "").lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+def extract_facts(user_request, analysis_report, limit=600):
+    """The goal plus every report line carrying a number: what a slide was built from."""
+    lines = [l.strip("-*# ").strip() for l in (analysis_report or "").splitlines()]
+    facts = [user_request or ""] + [l for l in lines if re.search(r"\d", l)]
+    return " | ".join(f for f in facts if f)[:limit]
+
+
+class SlideLibrary:
+    def __init__(self, path=SLIDE_LIBRARY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._reader = None      # long-lived connection for the cheap version check
+        self._version = None     # (row count, max id) the index was built from
+        self._docs = {}          # id -> slide dict
+        self._postings = {}      # term -> [(id, precomputed BM25 impact), ...]
+        self._ensure_schema()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _ensure_schema(self):
+        with self._connect() as conn:
+            conn.execute(SCHEMA)
+
+    # --- WRITE PATH ---
+    def add_plan(self, narrative_plan, user_request="", analysis_report=""):
+        """
+        Stores every slide of an approved plan. Re-adding a slide just bumps its
+        usage: a slide counts as used only when an approved deck contains it.
+        """
+        facts = extract_facts(user_request, analysis_report)
+        now = time.time()
+        added = 0
+        with self._connect() as conn:
+            for slide in (narrative_plan or {}).get("slides", []):
+                title = slide.get("title", "").strip()
+                bullets = [b for b in slide.get("bullets", []) if b]
+                if not title or title == "Error":
+                    continue
+                fingerprint = hashlib.sha256(json.dumps([title, bullets]).encode("utf-8")).hexdigest()
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO slides (fingerprint, title, bullets, speaker_notes, facts, created_at, last_used, use_count) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, 1)",
+                    (fingerprint, title, json.dumps(bullets), slide.get("speaker_notes", ""), facts, now, now),
+                )
+                if cur.rowcount:
+                    added += 1
+                else:
+                    conn.execute(
+                        "UPDATE slides SET use_count = use_count + 1, last_used = ? WHERE fingerprint = ?",
+                        (now, fingerprint),
+                    )
+        return added
+
+    def prune(self, max_age_days=180, min_uses=2, max_slides=5000):
+        """
+        Drops slides not used within `max_age_days` unless they were reused at
+        least `min_uses` times, then keeps only the `max_slides` most used.
+        """
+        cutoff = time.time() - max_age_days * 86400
+        with self._connect() as conn:
+            removed = conn.execute(
+                "DELETE FROM slides WHERE last_used < ? AND use_count < ?", (cutoff, min_uses)
+            ).rowcount
+            removed += conn.execute(
+                "DELETE FROM slides WHERE id NOT IN "
+                "(SELECT id FROM slides ORDER BY use_count DESC, last_used DESC LIMIT ?)",
+                (max_slides,),
+            ).rowcount
+        return removed
+
+    # --- READ PATH ---
+    def _refresh(self):
+        """
+        Rebuilds the BM25 index when slides were added or pruned (including by
+        other processes). Usage bumps don't change (count, max id), so the
+        common path is a single tiny query on a reused connection.
+        """
+        if self._reader is None:
+            self._reader = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            self._reader.row_factory = sqlite3.Row
+        version = tuple(self._reader.execute("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM slides").fetchone())
+        if version == self._version:
+            return
+        rows = self._reader.execute("SELECT id, title, bullets, speaker_notes, facts FROM slides").fetchall()
+
+        docs, term_counts, lengths = {}, {}, {}
+        for row in rows:
+            slide = {
+                "title": row["title"],
+                "bullets": json.loads(row["bullets"]),
+                "speaker_notes": row["speaker_notes"],
+            }
+            terms = tokenize(row["title"]) * TITLE_WEIGHT + tokenize(" ".join(slide["bullets"])) + tokenize(row["facts"])
+            term_counts[row["id"]] = Counter(terms)
+            docs[row["id"]] = slide
+            lengths[row["id"]] = len(terms)
+
+        # Fold idf and length normalisation into one weight per (term, doc),
+        # so a query is just a sum over the postings of its terms.
+        n = len(docs)
+        avgdl = (sum(lengths.values()) / n) if n else 1
+        doc_freq = Counter(term for counts in term_counts.values() for term in counts)
+        postings = {}
+        for doc_id, counts in term_counts.items():
+            norm = K1 * (1 - B + B * lengths[doc_id] / avgdl)
+            for term, tf in counts.items():
+                idf = math.log(1 + (n - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+                postings.setdefault(term, []).append((doc_id, idf * tf * (K1 + 1) / (tf + norm)))
+        self._docs, self._postings, self._version = docs, postings, version
+
+    def search(self, query, k=3, max_query_terms=24):
+        """
+        Top-k (slide_id, score, slide) by BM25 over title, bullets and facts.
+        Long queries (a whole report) are cut to their `max_query_terms`
+        rarest terms, which carry nearly all of the BM25 signal.
+        """
+        with self._lock:
+            self._refresh()
+            if not self._docs:
+                return []
+            terms = [t for t in set(tokenize(query)) if t in self._postings]
+            terms = sorted(terms, key=lambda t: len(self._postings[t]))[:max_query_terms]
+            scores = {}
+            for term in terms:
+                for doc_id, impact in self._postings[term]:
+                    scores[doc_id] = scores.get(doc_id, 0.0) + impact
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [(doc_id, score, self._docs[doc_id]) for doc_id, score in best]
+
+    def stats(self):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(use_count), 0), MIN(created_at), MAX(last_used) FROM slides"
+            ).fetchone()
+        return {"slides": row[0], "total_uses": row[1], "oldest": row[2], "last_used": row[3]}
+
+
+_library = None
+_library_lock = threading.Lock()
+
+
+def get_library():
+    """Process-wide library, opened on first use (None when SLIDE_LIBRARY=0)."""
+    global _library
+    if _library is None and SLIDE_LIBRARY_ENABLED:
+        with _library_lock:
+            if _library is None and SLIDE_LIBRARY_ENABLED:
+                _library = SlideLibrary()
+    return _library
+
+
+def disable_library():
+    """Turns the library off for the rest of this process (same as SLIDE_LIBRARY=0)."""
+    global SLIDE_LIBRARY_ENABLED, _library
+    with _library_lock:
+        SLIDE_LIBRARY_ENABLED, _library = False, None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats")
+    search = sub.add_parser("search")
+    search.add_argument("query")
+    search.add_argument("-k", type=int, default=5)
+    prune = sub.add_parser("prune")
+    prune.add_argument("--max-age-days", type=float, default=180)
+    prune.add_argument("--min-uses", type=int, default=2)
+    prune.add_argument("--max-slides", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    library = SlideLibrary()
+    if args.command == "stats":
+        print(json.dumps(library.stats(), indent=2))
+    elif args.command == "search":
+        start = time.perf_counter()
+        hits = library.search(args.query, k=args.k)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        for doc_id, score, slide in hits:
+            print(f"{score:6.2f}  #{doc_id}  {slide['title']}")
+        print(f"({elapsed_ms:.2f} ms)")
+    elif args.command == "prune":
+        print(f"Removed {library.prune(args.max_age_days, args.min_uses, args.max_slides)} slides.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,42 @@
+import hashlib
+import html
 import json
+import math
 import os
-from io import BytesIO
+import time
+from functools import partial
 from uuid import uuid4
 
-import pandas as pd
 import streamlit as st
-from pypdf import PdfReader
 
 # --- CUSTOM MODULES ---
-from agent_logic import app
-from create_ppt import generate_pptx
+import budget
+from agent_logic import get_app, save_approved_plan
+from artifact_store import store
+from bundle import list_bundles, open_bundle
+from dedup import dedupe_sources
+from ingest import build_raw_content, read_uploaded_file
+from job_queue import get_queue
+from metrics import registry, start_exporter
+from session_recorder import start_recording
+from tracing import tracer
+
+SLIDES_PER_PAGE = 10
+
+# Set SESSION_RECORD_DIR to capture every session as a replayable JSONL log.
+SESSION_RECORD_DIR = os.getenv("SESSION_RECORD_DIR")
+
+# METRICS_PORT / METRICS_FILE expose service metrics (see metrics.py); started once per server process.
+_script_start = time.perf_counter()
+start_exporter()
+SCRIPT_RUN_SECONDS = registry.histogram("streamlit_script_run_seconds", "Full top-to-bottom script reruns.")
+try:
+    get_queue()
+except RuntimeError as exc:
+    st.error(str(exc))
+    st.stop()
+if get_queue():
+    registry.gauge("job_queue_depth", "Jobs waiting for a worker.", fn=lambda: get_queue().counts().get("queued", 0))
 
 # ---- Custom CSS: Professional UI, No Emojis, Direct Form Styling ----
 st.markdown("""
@@ -203,6 +230,28 @@ st.markdown("""
         color: var(--slate);
         font-style: italic;
     }
+    .slide-card.changed { border-left: 4px solid var(--amber); }
+    .slide-badge {
+        float: right;
+        font-size: 0.7rem;
+        font-weight: 600;
+        color: var(--amber);
+        background: var(--amber-bg);
+        border-radius: 4px;
+        padding: 0.1rem 0.4rem;
+    }
+
+    /* TRACE WATERFALL */
+    .waterfall { font-size: 0.75rem; color: var(--navy); }
+    .wf-row { display: flex; align-items: center; gap: 0.5rem; margin-bottom: 2px; }
+    .wf-label { flex: 0 0 38%; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; }
+    .wf-track { flex: 1; position: relative; height: 12px; background: #f1f5f9; border-radius: 3px; }
+    .wf-bar { position: absolute; top: 0; height: 12px; border-radius: 3px; background: var(--blue); min-width: 2px; }
+    .wf-bar.llm { background: var(--violet); }
+    .wf-bar.checkpoint { background: var(--slate); }
+    .wf-bar.parse { background: var(--amber); }
+    .wf-bar.render { background: var(--emerald); }
+    .wf-ms { flex: 0 0 4.5rem; text-align: right; color: var(--slate); }
 
     /* Hiding Streamlit details */
     #MainMenu, footer, header { visibility: hidden; }
@@ -219,59 +268,188 @@ def init_session_state():
         st.session_state.snapshot = None
     if "inputs" not in st.session_state:
         st.session_state.inputs = None
-    if "pptx_bytes" not in st.session_state:
-        st.session_state.pptx_bytes = None
+    # Decks and templates are spooled to disk; session_state only keeps their paths.
+    if "pptx_path" not in st.session_state:
+        st.session_state.pptx_path = None
     if "feedback_text" not in st.session_state:
         st.session_state.feedback_text = ""
     if "clear_feedback" not in st.session_state:
         st.session_state.clear_feedback = False
     if "pending_agent_run" not in st.session_state:
         st.session_state.pending_agent_run = None
+    if "pending_feedback" not in st.session_state:
+        st.session_state.pending_feedback = None
+    # Queue mode only: the job currently running this thread's next graph step
+    if "job_id" not in st.session_state:
+        st.session_state.job_id = None
+    if "job_error" not in st.session_state:
+        st.session_state.job_error = None
     # Track the template file across reruns
-    if "template_file" not in st.session_state:
-        st.session_state.template_file = None
+    if "template_path" not in st.session_state:
+        st.session_state.template_path = None
+    if "template_file_id" not in st.session_state:
+        st.session_state.template_file_id = None
+    if "dedup_stats" not in st.session_state:
+        st.session_state.dedup_stats = None
+    if "recorder" not in st.session_state:
+        st.session_state.recorder = None
+    # Slide plan view: per-slide hashes of the current and previous architect drafts
+    if "plan_hash" not in st.session_state:
+        st.session_state.plan_hash = None
+        st.session_state.slide_hashes = []
+        st.session_state.prev_slide_hashes = None
+    if "slide_page" not in st.session_state:
+        st.session_state.slide_page = 1
 
 
 def append_chat(role, content):
     st.session_state.chat_history.append({"role": role, "content": content})
 
 
-def run_until_pause(inputs=None):
+def run_until_pause(inputs=None, feedback=None):
     config = {"configurable": {"thread_id": st.session_state.thread_id}}
-    cursor = app.stream(inputs, config=config)
-    for _ in cursor:
-        pass
-    st.session_state.snapshot = app.get_state(config)
-
-
-def truncate_text(text, limit=12000):
-    if len(text) <= limit:
-        return text
-    return text[:limit] + "\n\n[TRUNCATED]"
+    app = get_app()
+    with tracer.span("graph.run", thread_id=st.session_state.thread_id):
+        if feedback is not None:
+            app.update_state(config, {"human_feedback": feedback})
+        cursor = app.stream(inputs, config=config)
+        for _ in cursor:
+            pass
+        snapshot = app.get_state(config)
+        if not snapshot.next:
+            save_approved_plan(snapshot.values)
+    st.session_state.snapshot = snapshot
 
 
-def read_uploaded_file(uploaded_file):
-    name = uploaded_file.name
-    suffix = os.path.splitext(name)[1].lower()
-    data = uploaded_file.getvalue()
+def poll_queued_run(queue, inputs=None, feedback=None, expected_step=None):
+    """
+    Queue mode: enqueues the next graph step for a worker (once), then reports
+    whether it is still in flight. When it settles, reads the shared checkpoint.
+    """
+    thread_id = st.session_state.thread_id
+    if st.session_state.job_id is None:
+        st.session_state.job_error = None
+        if inputs is not None:
+            st.session_state.job_id = queue.enqueue(thread_id, "start", {"inputs": inputs})
+        else:
+            st.session_state.job_id = queue.enqueue(
+                thread_id, "resume", {"feedback": feedback, "expected_step": expected_step}
+            )
 
-    if suffix == ".pdf":
-        reader = PdfReader(BytesIO(data))
-        pages = [page.extract_text() or "" for page in reader.pages]
-        return "\n".join(pages)
+    job = queue.get(st.session_state.job_id)
+    if job["status"] in ("queued", "running"):
+        return True
+
+    st.session_state.job_error = job["error"] if job["status"] == "failed" else None
+    st.session_state.job_id = None
+    st.session_state.snapshot = get_app().get_state({"configurable": {"thread_id": thread_id}})
+    return False
+
+
+def render_waterfall(spans, max_rows=60):
+    """Renders the run's spans as a horizontal timing waterfall."""
+    spans = [s for s in spans if s.get("endTimeUnixNano")][-max_rows:]
+    if not spans:
+        st.caption("No trace recorded yet.")
+        return
+
+    t0 = min(s["startTimeUnixNano"] for s in spans)
+    total = max(s["endTimeUnixNano"] for s in spans) - t0 or 1
+    by_id = {s["spanId"]: s for s in spans}
+
+    rows = []
+    for s in spans:
+        depth, parent = 0, by_id.get(s["parentSpanId"])
+        while parent is not None:
+            depth += 1
+            parent = by_id.get(parent["parentSpanId"])
+        left = 100 * (s["startTimeUnixNano"] - t0) / total
+        width = 100 * (s["endTimeUnixNano"] - s["startTimeUnixNano"]) / total
+        duration_ms = (s["endTimeUnixNano"] - s["startTimeUnixNano"]) / 1e6
+        kind = s["name"].split(".")[0]
+        attrs = s.get("attributes", {})
+        title = html.escape(", ".join(f"{k}={v}" for k, v in attrs.items() if v is not None), quote=True)
+        rows.append(
+            f'<div class="wf-row" title="{title}">'
+            f'<span class="wf-label" style="padding-left:{depth * 0.75}rem">{html.escape(s["name"])}</span>'
+            f'<span class="wf-track"><span class="wf-bar {html.escape(kind, quote=True)}" style="left:{left:.2f}%;width:{width:.2f}%"></span></span>'
+            f'<span class="wf-ms">{duration_ms:,.0f} ms</span>'
+            f'</div>'
+        )
+    st.markdown('<div class="waterfall">' + "".join(rows) + "</div>", unsafe_allow_html=True)
 
-    if suffix in {".csv"}:
-        df = pd.read_csv(BytesIO(data))
-        return df.to_csv(index=False)
 
-    if suffix in {".xlsx", ".xls"}:
-        df = pd.read_excel(BytesIO(data))
-        return df.to_csv(index=False)
+def content_hash(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
 
-    if suffix in {".txt", ".md"}:
-        return data.decode("utf-8", errors="ignore")
 
-    return f"Unsupported file type: {suffix}"
+def track_plan_versions(narrative_plan):
+    """
+    Remembers the previous architect draft (as per-slide hashes) whenever the
+    plan changes. Returns (plan hash, indices of changed slides or None).
+    """
+    plan_key = content_hash(narrative_plan)
+    if st.session_state.plan_hash != plan_key:
+        if st.session_state.plan_hash is not None:
+            st.session_state.prev_slide_hashes = st.session_state.slide_hashes
+        st.session_state.plan_hash = plan_key
+        st.session_state.slide_hashes = [content_hash(slide) for slide in narrative_plan.get("slides", [])]
+        st.session_state.slide_page = 1
+
+    previous = st.session_state.prev_slide_hashes
+    if previous is None:
+        return plan_key, None
+    # By content, not position: inserting a slide must not flag every slide after it.
+    previous = set(previous)
+    changed = tuple(i for i, h in enumerate(st.session_state.slide_hashes) if h not in previous)
+    return plan_key, changed
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def slide_cards_html(plan_key, _slides, indices, changed):
+    """
+    One HTML block for the given slides. Cached by plan hash and page, so
+    reruns (e.g. typing feedback) don't rebuild it. `_slides` is not hashed.
+    """
+    changed = set(changed or ())
+    cards = []
+    for i in indices:
+        slide = _slides[i]
+        title = html.escape(str(slide.get("title", "Untitled Slide")))
+        bullets = "".join(f"<li>{html.escape(str(b))}</li>" for b in slide.get("bullets", []))
+        notes = html.escape(str(slide.get("speaker_notes") or "No notes."))
+        badge = '<span class="slide-badge">Changed</span>' if i in changed else ""
+        cards.append(
+            f'<div class="slide-card{" changed" if i in changed else ""}">'
+            f'{badge}<div class="slide-title">Slide {i + 1}: {title}</div>'
+            f'<ul>{bullets}</ul>'
+            f'<div class="slide-notes"><strong>Speaker Notes:</strong> {notes}</div>'
+            f'</div>'
+        )
+    return "".join(cards)
+
+
+def render_slide_plan(narrative_plan):
+    slides = narrative_plan.get("slides", [])
+    if not slides:
+        st.warning("No slides found in the plan.")
+        return
+
+    plan_key, changed = track_plan_versions(narrative_plan)
+    indices = list(range(len(slides)))
+    if changed is not None:
+        st.caption(f"{len(changed)} of {len(slides)} slides changed since the previous draft.")
+        if changed and st.toggle("Show only changed slides", key="only_changed_slides"):
+            indices = list(changed)
+
+    pages = max(1, math.ceil(len(indices) / SLIDES_PER_PAGE))
+    if pages > 1:
+        st.session_state.slide_page = min(st.session_state.slide_page, pages)
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key="slide_page")
+    else:
+        page = 1
+    page_indices = tuple(indices[(page - 1) * SLIDES_PER_PAGE:page * SLIDES_PER_PAGE])
+    st.markdown(slide_cards_html(plan_key, slides, page_indices, changed), unsafe_allow_html=True)
 
 
 def render_workflow_stepper(snapshot, next_step, pending_agent_run=None):
@@ -357,11 +535,26 @@ if pending_for_stepper:
     )
     
     run_inputs = st.session_state.inputs if pending_for_stepper == "analyst" else None
-    run_until_pause(run_inputs)
+    pending_feedback = st.session_state.pending_feedback
+    queue = get_queue()
+    if queue is not None:
+        # Workers run the graph; this script only enqueues and polls.
+        if poll_queued_run(queue, run_inputs, pending_feedback, expected_step=next_step):
+            time.sleep(0.5)
+            st.rerun()
+    else:
+        run_until_pause(run_inputs, pending_feedback)
     
     st.session_state.pending_agent_run = None
+    st.session_state.pending_feedback = None
+    if st.session_state.recorder:
+        # Waiting on the user from here on; not part of the run's latency.
+        st.session_state.recorder.pause()
     st.rerun()
 
+if st.session_state.job_error:
+    st.error(f"The agent run failed after retries: {st.session_state.job_error}")
+
 # ---- 4. Main Layout ----
 left, right = st.columns([2, 3], gap="large")
 
@@ -371,10 +564,23 @@ with left:
 
     # 1. Input Form (Visible only at start)
     if not workflow_active:
+        pack = None
+        bundles = list_bundles()
+        if bundles:
+            bundle_name = st.selectbox(
+                "Prebuilt data pack (optional)",
+                ["None"] + bundles,
+                help="Built with `python bundle.py build FOLDER`. Skips uploading and parsing the pack's files.",
+            )
+            if bundle_name != "None":
+                pack = open_bundle(bundle_name)
+                if pack.is_stale():
+                    st.warning(f"'{bundle_name}' is older than its source folder. Rebuild it with `python bundle.py build` to pick up the changes.")
+
         with st.form("input_form"):
             user_request = st.text_input(
                 "User goal — What deck do you need?",
-                value="I need a deck for the Board on our proposed GCC residential expansion.",
+                value=(pack and pack.user_request) or "I need a deck for the Board on our proposed GCC residential expansion.",
                 placeholder="e.g. Update the board on Q3 financials...",
             )
             uploaded_files = st.file_uploader(
@@ -396,26 +602,40 @@ with left:
                 submitted = st.form_submit_button("Start Analysis", type="primary", use_container_width=True)
 
         if submitted:
-            combined_sections = []
-            if uploaded_files:
-                for uploaded_file in uploaded_files:
-                    try:
-                        content = read_uploaded_file(uploaded_file)
-                    except Exception as exc:
-                        content = f"Failed to read file: {exc}"
-                    combined_sections.append(
-                        f"FILE: {uploaded_file.name}\n{truncate_text(content)}"
-                    )
-            if additional_notes.strip():
-                combined_sections.append(f"NOTES:\n{additional_notes.strip()}")
-            if not combined_sections:
-                combined_sections.append("No files or notes were provided.")
-
-            raw_files_content = "\n\n".join(combined_sections)
+            with tracer.span("ingest", thread_id=st.session_state.thread_id):
+                parsed_files = []
+                if uploaded_files:
+                    for uploaded_file in uploaded_files:
+                        try:
+                            content = read_uploaded_file(uploaded_file)
+                        except Exception as exc:
+                            content = f"Failed to read file: {exc}"
+                        parsed_files.append((uploaded_file.name, content))
+
+                if pack and not parsed_files and not additional_notes.strip():
+                    # Nothing added to the pack: its prompt input is already built.
+                    raw_files_content, dedup_stats = pack.raw_files_content, pack.dedup_stats
+                else:
+                    if pack:
+                        parsed_files = pack.files() + parsed_files
+                    parsed_files, dedup_stats = dedupe_sources(parsed_files)
+                    raw_files_content = build_raw_content(parsed_files, additional_notes)
+                if pack:
+                    raw_files_content += pack.prompt_supplement(user_request, raw_files_content)
+            st.session_state.dedup_stats = dedup_stats
             st.session_state.inputs = {
                 "user_request": user_request,
                 "raw_files_content": raw_files_content,
+                # Set by an auth proxy in front of the app; drives the per-user daily token cap.
+                # Without one there is no user to cap (not one shared pool): the per-thread caps still apply.
+                "user_id": st.context.headers.get("X-Forwarded-User") or None,
             }
+            if SESSION_RECORD_DIR:
+                os.makedirs(SESSION_RECORD_DIR, exist_ok=True)
+                thread_id = st.session_state.thread_id
+                recorder = start_recording(thread_id, os.path.join(SESSION_RECORD_DIR, f"{thread_id}.jsonl"))
+                recorder.record("input", inputs=st.session_state.inputs)
+                st.session_state.recorder = recorder
             append_chat("user", user_request)
             st.session_state.pending_agent_run = "analyst"
             st.rerun()
@@ -447,7 +667,9 @@ with left:
             with st.expander("Design Settings (Optional)"):
                 uploaded_tmpl = st.file_uploader("Upload Company Template (.pptx)", type=["pptx"])
                 if uploaded_tmpl:
-                    st.session_state.template_file = uploaded_tmpl
+                    if uploaded_tmpl.file_id != st.session_state.template_file_id:
+                        st.session_state.template_path = store.put(st.session_state.thread_id, uploaded_tmpl, ".pptx")
+                        st.session_state.template_file_id = uploaded_tmpl.file_id
                     st.success(f"Loaded: {uploaded_tmpl.name}")
                     st.caption("This template will be applied when you export the deck.")
 
@@ -461,10 +683,9 @@ with left:
         if st.button("Continue Workflow", type="primary"):
             if feedback.strip() == "":
                 feedback = "Proceed with this strategy."
-            app.update_state(
-                {"configurable": {"thread_id": st.session_state.thread_id}},
-                {"human_feedback": feedback},
-            )
+            if st.session_state.recorder:
+                st.session_state.recorder.record("feedback", step=next_step, text=feedback, wait_s=st.session_state.recorder.resume())
+            st.session_state.pending_feedback = feedback
             st.session_state.clear_feedback = True
             st.session_state.pending_agent_run = "story_architect"
             st.rerun()
@@ -476,35 +697,56 @@ with left:
         col_dl, col_reset = st.columns([1, 1])
         with col_dl:
             if st.button("Generate PowerPoint", type="primary", use_container_width=True):
+                from create_ppt import generate_pptx  # python-pptx loads only when exporting
+                wait_s = st.session_state.recorder.resume() if st.session_state.recorder else 0.0
+
                 narrative_plan = snapshot.values.get("narrative_plan", {})
                 
-                # Retrieve the template from session state (if uploaded)
-                tmpl_file = st.session_state.get("template_file")
+                # Retrieve the spooled template (if uploaded)
+                tmpl_path = st.session_state.get("template_path")
+                tmpl_file = store.open(tmpl_path) if store.exists(tmpl_path) else None
                 
                 # Pass template to generation (handles template_file logic)
                 try:
-                    pptx_stream = generate_pptx(narrative_plan, template_file=tmpl_file)
-                    st.session_state.pptx_bytes = pptx_stream.getvalue()
-                    st.rerun()
+                    with tracer.span("render.pptx", thread_id=st.session_state.thread_id) as span:
+                        pptx_stream = generate_pptx(narrative_plan, template_file=tmpl_file)
                 except TypeError:
                     # Fallback if generate_pptx doesn't support template_file yet
                     st.warning("Note: Template feature requires updated 'create_ppt.py'. Generating with default layout...")
-                    pptx_stream = generate_pptx(narrative_plan)
-                    st.session_state.pptx_bytes = pptx_stream.getvalue()
-                    st.rerun()
+                    with tracer.span("render.pptx", thread_id=st.session_state.thread_id) as span:
+                        pptx_stream = generate_pptx(narrative_plan)
+                finally:
+                    if tmpl_file:
+                        tmpl_file.close()
+
+                st.session_state.pptx_path = store.put(st.session_state.thread_id, pptx_stream, ".pptx")
+                del pptx_stream
+                recorder = st.session_state.recorder
+                if recorder:
+                    recorder.record("render", seconds=span.duration_ms / 1000, pptx_bytes=os.path.getsize(st.session_state.pptx_path), wait_s=wait_s)
+                    recorder.close()
+                    st.session_state.recorder = None
+                st.rerun()
                 
-            if st.session_state.pptx_bytes:
-                st.download_button(
-                    label="Download Final_Deck.pptx",
-                    data=st.session_state.pptx_bytes,
-                    file_name="Final_Deck.pptx",
-                    mime="application/vnd.openxmlformats-officedocument.presentationml.presentation",
-                    type="secondary",
-                    use_container_width=True
-                )
+            if st.session_state.pptx_path:
+                if store.exists(st.session_state.pptx_path):
+                    st.download_button(
+                        label="Download Final_Deck.pptx",
+                        # Read from disk only when clicked
+                        data=partial(store.read_bytes, st.session_state.pptx_path),
+                        file_name="Final_Deck.pptx",
+                        mime="application/vnd.openxmlformats-officedocument.presentationml.presentation",
+                        type="secondary",
+                        use_container_width=True
+                    )
+                else:
+                    st.caption("This deck has expired from storage. Generate it again to download.")
         
         with col_reset:
             if st.button("Start New Deck", type="secondary", use_container_width=True):
+                 if st.session_state.recorder:
+                     st.session_state.recorder.close()
+                 store.drop_thread(st.session_state.thread_id)
                  st.session_state.clear()
                  st.rerun()
                 
@@ -539,34 +781,32 @@ with right:
         # 2. Slide Plan
         with st.expander("Slide Plan", expanded=(current_step == "critique" or current_step == "done")):
             if narrative_plan:
-                slides = narrative_plan.get("slides", [])
-                if not slides:
-                    st.warning("No slides found in the plan.")
-                else:
-                    for i, slide in enumerate(slides):
-                        title = slide.get("title", "Untitled Slide")
-                        bullets = slide.get("bullets", [])
-                        notes = slide.get("speaker_notes", "No notes.")
-                        
-                        st.markdown(f"""
-                        <div class="slide-card">
-                            <div class="slide-title">Slide {i+1}: {title}</div>
-                            <ul>
-                        """, unsafe_allow_html=True)
-                        
-                        for b in bullets:
-                            st.markdown(f"<li>{b}</li>", unsafe_allow_html=True)
-                            
-                        st.markdown(f"""
-                            </ul>
-                            <div class="slide-notes"><strong>Speaker Notes:</strong> {notes}</div>
-                        </div>
-                        """, unsafe_allow_html=True)
+                render_slide_plan(narrative_plan)
             else:
                 st.info("Waiting for Story Architect...")
 
+        ledger = snapshot.values.get("ledger")
+        for notice in (ledger or {}).get("notices", []):
+            st.warning(f"Budget: {notice}")
+
         # 3. Status
         with st.expander("System Status", expanded=False):
             st.write(f"**Step:** `{current_step}`")
             if critique_status:
-                st.write(f"**Critique Decision:** `{critique_status}`")
\ No newline at end of file
+                st.write(f"**Critique Decision:** `{critique_status}`")
+            dedup_stats = st.session_state.dedup_stats
+            if dedup_stats and dedup_stats["duplicates_removed"]:
+                saved = dedup_stats["tokens_saved"]
+                st.write(
+                    f"**Duplicate Content Removed:** {dedup_stats['duplicates_removed']} paragraphs "
+                    + (f"(~{saved:,} tokens saved per Analyst call)" if saved > 0 else "(the freed room went to text truncation had cut)")
+                )
+            if ledger:
+                st.write(
+                    f"**Budget Used:** {ledger['iterations']}/{budget.MAX_ITERATIONS} LLM calls, "
+                    f"{ledger['tokens']:,}/{budget.MAX_TOKENS:,} tokens, {ledger['llm_seconds']:.0f}/{budget.MAX_LLM_SECONDS:.0f}s LLM time"
+                )
+            st.write("**Run Trace**")
+            render_waterfall(tracer.get_trace(st.session_state.thread_id))
+
+SCRIPT_RUN_SECONDS.observe(time.perf_counter() - _script_start)
@@ -0,0 +1,174 @@
+"""
+Lightweight per-run tracing.
+
+Every LangGraph thread_id gets its own trace. Spans nest through a contextvar,
+so an LLM call made inside a node automatically becomes that node's child.
+Finished spans are appended as OTLP-style JSON lines to
+`$TRACE_DIR/<thread_id>.jsonl` (default `.traces/`). Set TRACING=0 to disable.
+Trace files untouched for `TRACE_TTL_SECONDS` (default 7 days) are deleted.
+"""
+import contextvars
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from metrics import SPAN_SECONDS
+
+TRACE_DIR = os.getenv("TRACE_DIR", ".traces")
+TRACING_ENABLED = os.getenv("TRACING", "1") != "0"
+TRACE_TTL_SECONDS = int(os.getenv("TRACE_TTL_SECONDS", 7 * 24 * 3600))
+CLEANUP_INTERVAL_SECONDS = 600
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("thread_id", "trace_id", "span_id", "parent_span_id", "name", "start_ns", "end_ns", "attributes")
+
+    def __init__(self, name, thread_id, parent=None, attributes=None):
+        self.name = name
+        self.thread_id = thread_id
+        self.trace_id = hashlib.md5(thread_id.encode("utf-8")).hexdigest()
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_span_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_dict(self):
+        return {
+            "thread_id": self.thread_id,
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id,
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": self.attributes,
+        }
+
+
+class Tracer:
+    def __init__(self, trace_dir=TRACE_DIR, enabled=TRACING_ENABLED, ttl_seconds=TRACE_TTL_SECONDS):
+        self.trace_dir = trace_dir
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+
+    def _path(self, thread_id):
+        safe = re.sub(r"[^A-Za-z0-9_.-]", "_", thread_id)
+        return os.path.join(self.trace_dir, f"{safe}.jsonl")
+
+    def _export(self, span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            os.makedirs(self.trace_dir, exist_ok=True)
+            with open(self._path(span.thread_id), "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        self.maybe_cleanup()
+
+    def maybe_cleanup(self):
+        """Runs `cleanup` at most once per CLEANUP_INTERVAL_SECONDS."""
+        if time.time() - self._last_cleanup >= CLEANUP_INTERVAL_SECONDS:
+            self.cleanup()
+
+    def cleanup(self):
+        """Deletes trace files that have not been appended to within the TTL."""
+        with self._lock:
+            self._last_cleanup = now = time.time()
+            if not os.path.isdir(self.trace_dir):
+                return
+            for name in os.listdir(self.trace_dir):
+                path = os.path.join(self.trace_dir, name)
+                try:
+                    if name.endswith(".jsonl") and now - os.path.getmtime(path) > self.ttl_seconds:
+                        os.remove(path)
+                except OSError:
+                    pass  # removed concurrently
+
+    @contextmanager
+    def span(self, name, thread_id=None, **attributes):
+        """
+        Opens a child of the current span. A root span needs a thread_id;
+        without one (and no parent) the span is timed but not exported.
+        """
+        parent = _current_span.get()
+        if parent is not None and thread_id in (None, parent.thread_id):
+            thread_id = parent.thread_id
+        else:
+            parent = None
+
+        span = Span(name, thread_id or "", parent, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as exc:
+            span.set(error=repr(exc))
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current_span.reset(token)
+            SPAN_SECONDS.observe((span.end_ns - span.start_ns) / 1e9, span=name)
+            if self.enabled and thread_id:
+                self._export(span)
+
+    def get_trace(self, thread_id):
+        """All finished spans of a thread, ordered by start time."""
+        path = self._path(thread_id)
+        if not os.path.exists(path):
+            return []
+        with open(path, encoding="utf-8") as f:
+            spans = [json.loads(line) for line in f if line.strip()]
+        return sorted(spans, key=lambda s: s["startTimeUnixNano"])
+
+
+def current_span():
+    return _current_span.get()
+
+
+def thread_id_of(config):
+    return (config or {}).get("configurable", {}).get("thread_id")
+
+
+def traced_node(name):
+    """
+    Wraps a LangGraph node in a `node.<name>` span keyed by the run's thread_id.
+    Deliberately not using functools.wraps: LangGraph inspects the signature
+    to decide whether to pass `config`, so it must see ours, not the original.
+    """
+    def decorator(fn):
+        def node(state, config):
+            with tracer.span(f"node.{name}", thread_id=thread_id_of(config)):
+                return fn(state)
+        node.__name__ = fn.__name__
+        node.__doc__ = fn.__doc__
+        return node
+    return decorator
+
+
+def instrument_checkpointer(saver):
+    """Times every checkpoint write as a `checkpoint.put` span."""
+    original_put = saver.put
+
+    def put(config, checkpoint, metadata, new_versions):
+        with tracer.span("checkpoint.put", thread_id=thread_id_of(config), step=metadata.get("step")):
+            return original_put(config, checkpoint, metadata, new_versions)
+
+    saver.put = put
+    return saver
+
+
+tracer = Tracer()
@@ -0,0 +1,163 @@
+"""
+Out-of-process graph worker.
+
+Claims jobs from the local job queue and runs the graph for that thread_id
+until its next HITL interrupt, so deck generation scales independently of
+the Streamlit processes that only enqueue jobs and read results.
+
+    JOB_QUEUE_PATH=jobs.db CHECKPOINT_DB=checkpoints.db python worker.py --workers 4
+
+With METRICS_PORT set, worker N serves its metrics on METRICS_PORT + N.
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+
+from job_queue import JobQueue
+from metrics import METRICS_PORT, registry, start_exporter
+
+POLL_INTERVAL_SECONDS = 0.5
+
+QUEUE_WAIT = registry.histogram("job_queue_wait_seconds", "Time a job was runnable before a worker claimed it.", ["kind"])
+JOBS = registry.counter("jobs_processed_total", "Jobs finished by this worker, by outcome.", ["kind", "outcome"])
+
+
+class LeaseLost(Exception):
+    """The job's lease expired and another worker may have claimed it."""
+
+
+def run_job(job, lease_lost=None):
+    """
+    Executes one graph step for the job's thread. Returns the step it paused before (None = finished).
+    Raises LeaseLost between graph nodes once `lease_lost` is set.
+    """
+    from agent_logic import get_app, save_approved_plan
+
+    app = get_app()
+    config = {"configurable": {"thread_id": job["thread_id"]}}
+    payload = job["payload"]
+    snapshot = app.get_state(config)
+
+    # A retry whose previous attempt already got to the next pause must not stream past it.
+    paused = bool(snapshot.next) and snapshot.next[0] in app.interrupt_before_nodes
+
+    if job["kind"] == "start":
+        if snapshot.values and paused:
+            return snapshot.next[0]
+        # A retried start whose first attempt already checkpointed just continues.
+        inputs = None if snapshot.values else payload["inputs"]
+    elif job["kind"] == "resume":
+        # Only apply the feedback if we are still paused where the UI saw us;
+        # otherwise a previous attempt already applied it before crashing.
+        if snapshot.next and snapshot.next[0] == payload.get("expected_step"):
+            app.update_state(config, {"human_feedback": payload["feedback"]})
+        elif paused:
+            return snapshot.next[0]
+        inputs = None
+    else:
+        raise ValueError(f"Unknown job kind: {job['kind']}")
+
+    for _ in app.stream(inputs, config=config):
+        if lease_lost is not None and lease_lost.is_set():
+            raise LeaseLost(f"job {job['id']} lease lost mid-run")
+
+    snapshot = app.get_state(config)
+    if lease_lost is not None and lease_lost.is_set():
+        # The new owner re-runs this step; only it may publish the plan.
+        raise LeaseLost(f"job {job['id']} lease lost before saving")
+    if not snapshot.next:
+        save_approved_plan(snapshot.values)
+        return None
+    return snapshot.next[0]
+
+
+def work_loop(queue_path, worker_id, stop_event=None):
+    queue = JobQueue(queue_path)
+    print(f"[{worker_id}] ready (queue={queue_path})", flush=True)
+
+    while not (stop_event and stop_event.is_set()):
+        job = queue.claim(worker_id)
+        if job is None:
+            time.sleep(POLL_INTERVAL_SECONDS)
+            continue
+
+        print(f"[{worker_id}] job {job['id']} {job['kind']} thread={job['thread_id']} attempt={job['attempts']}", flush=True)
+        QUEUE_WAIT.observe(max(0.0, time.time() - job["available_at"]), kind=job["kind"])
+
+        # Keep the lease alive while the (LLM-bound) step runs.
+        done, lease_lost = threading.Event(), threading.Event()
+
+        def heartbeat():
+            while not done.wait(queue.lease_seconds / 3):
+                if not queue.heartbeat(job["id"], worker_id):
+                    lease_lost.set()
+                    break
+
+        beat = threading.Thread(target=heartbeat, daemon=True)
+        beat.start()
+        try:
+            next_step = run_job(job, lease_lost)
+            queue.complete(job["id"], worker_id, next_step)
+            JOBS.inc(kind=job["kind"], outcome="interrupted" if next_step else "done")
+            print(f"[{worker_id}] job {job['id']} -> {next_step or 'done'}", flush=True)
+        except LeaseLost as exc:
+            # Not ours any more: leave the job to whichever worker holds it now.
+            JOBS.inc(kind=job["kind"], outcome="lease_lost")
+            print(f"[{worker_id}] {exc}; abandoning", flush=True)
+        except Exception as exc:
+            queue.fail(job["id"], worker_id, f"{type(exc).__name__}: {exc}")
+            JOBS.inc(kind=job["kind"], outcome="error")
+            traceback.print_exc()
+        finally:
+            done.set()
+            beat.join()
+
+
+def _worker_main(queue_path, index=0):
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    # One endpoint per worker process: METRICS_PORT, METRICS_PORT + 1, ...
+    start_exporter(port=int(METRICS_PORT) + index if METRICS_PORT else None)
+    try:
+        work_loop(queue_path, worker_id, stop)
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes to run on this machine.")
+    parser.add_argument("--queue", default=os.getenv("JOB_QUEUE_PATH"), help="Job queue database (default: $JOB_QUEUE_PATH).")
+    args = parser.parse_args(argv)
+
+    if not args.queue:
+        sys.exit("Set JOB_QUEUE_PATH (or pass --queue) to the same database the UI uses.")
+    if not os.getenv("CHECKPOINT_DB"):
+        sys.exit("Set CHECKPOINT_DB so workers and the UI share graph checkpoints.")
+
+    if args.workers == 1:
+        _worker_main(args.queue)
+        return
+
+    procs = [multiprocessing.Process(target=_worker_main, args=(args.queue, i)) for i in range(args.workers)]
+    for p in procs:
+        p.start()
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.join()
+
+
+if __name__ == "__main__":
+    main()